@@ -0,0 +1,13 @@
+int ack(int m, int n) {
+    while (m <= 0) {
+        return n + 1;
+    }
+    while (n <= 0) {
+        return ack(m - 1, 1);
+    }
+    return ack(m - 1, ack(m, n - 1));
+}
+
+int main(void) {
+    return ack(3, 7) - 1021;
+}
@@ -0,0 +1,93 @@
+"""
+Time CyCy on the C programs in this directory.
+
+Usage
+=====
+
+python benchmarks/bench.py [options] [BENCHMARK ...]
+
+
+Options
+-------
+
+--cycy PATH      the CyCy executable to benchmark (by default, run
+                 untranslated via ``python -m cycy``)
+--repeat N       run each benchmark N times and report the best (default 3)
+--opcodes        run the per-opcode microbenchmarks in ``opcodes/`` instead
+
+Benchmarks are the ``.c`` files in this directory, and all of them are run
+if none are named. Output written by the benchmarks is discarded.
+``puts`` and ``strlen_bytecode`` define library functions in C, whereas
+``puts_builtin`` and ``strlen`` call the native builtins (which take
+precedence over the prebuilt standard library's ``puts``).
+
+Each opcode microbenchmark runs the same counting loop as ``opcodes/loop.c``
+with a statement exercising one opcode in its body, so the time each takes
+beyond that of ``loop`` is the cost of dispatching and running its opcode
+a million times. Run them when adding or reordering opcodes.
+
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def benchmarks(names, directory=HERE):
+    if not names:
+        names = sorted(
+            name[:-2] for name in os.listdir(directory) if name.endswith(".c")
+        )
+    return [(name, os.path.join(directory, name + ".c")) for name in names]
+
+
+def time_one(command, repeat):
+    timings = []
+    with open(os.devnull, "w") as devnull:
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.call(command, stdout=devnull)
+            timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(argv):
+    cycy = [sys.executable, "-m", "cycy"]
+    repeat = 3
+    directory = HERE
+    names = []
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--cycy":
+            cycy = [next(arguments)]
+        elif argument == "--repeat":
+            repeat = int(next(arguments))
+        elif argument == "--opcodes":
+            directory = os.path.join(HERE, "opcodes")
+        else:
+            names.append(argument)
+
+    baseline = None
+    if directory != HERE:
+        baseline = time_one(
+            cycy + [os.path.join(directory, "loop.c")], repeat=repeat,
+        )
+
+    for name, path in benchmarks(names, directory=directory):
+        best = time_one(cycy + [path], repeat=repeat)
+        if baseline is None:
+            sys.stdout.write("%-20s %8.3fs\n" % (name, best))
+        else:
+            sys.stdout.write(
+                "%-20s %8.3fs %+8.3fs\n" % (name, best, best - baseline),
+            )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
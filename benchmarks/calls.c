@@ -0,0 +1,44 @@
+int puts(const char * string) {
+    int i = 0;
+    while (string[i] != 0) {
+        putchar(string[i]);
+        i = i + 1;
+    }
+    putchar('\n');
+    return i + 1;
+}
+
+int sum(int n) {
+    int a = 1;
+    int b = 2;
+    int c = 3;
+    int d = 4;
+    int e = 5;
+    int f = 6;
+    int g = 7;
+    int h = 8;
+    int total = 0;
+    while (n) {
+        total = total + a + b + c + d + e + f + g + h;
+        n = n - 1;
+    }
+    return total;
+}
+
+int fib(int x) {
+    while (x <= 2) {
+        return 1;
+    }
+    return fib(x - 1) + fib(x - 2);
+}
+
+int main(void) {
+    int expected = 75025;
+    int result = 0;
+    result = fib(25);
+    while (result != expected) {
+        puts("wrong answer");
+        return 1;
+    }
+    return sum(0);
+}
@@ -0,0 +1,14 @@
+int main(void) {
+    int i = 0;
+    int j = 0;
+    int total = 0;
+    while (i != 3000) {
+        j = 0;
+        while (j <= 1000) {
+            total = total + 1;
+            j = j + 1;
+        }
+        i = i + 1;
+    }
+    return total - 3003000;
+}
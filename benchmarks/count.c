@@ -0,0 +1,8 @@
+int main(void) {
+    int i = 0;
+    int n = 10000000;
+    while (i <= n) {
+        i = i + 1;
+    }
+    return i - 10000001;
+}
@@ -0,0 +1,10 @@
+int fib(int x) {
+    while (x <= 2) {
+        return 1;
+    }
+    return fib(x - 1) + fib(x - 2);
+}
+
+int main(void) {
+    return fib(27) - 196418;
+}
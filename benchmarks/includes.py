@@ -0,0 +1,99 @@
+"""
+Measure how much work a diamond of includes costs, with and without
+``#pragma once``.
+
+Usage
+=====
+
+python benchmarks/includes.py [options]
+
+
+Options
+-------
+
+--headers N       how many headers the program includes, each of which
+                  includes the same base header (default 30)
+--declarations N  how many prototypes the base header declares
+                  (default 1000)
+
+The program is preprocessed and parsed (in this process) once with an
+unguarded base header, which is expanded once for each header including
+it, and once with a base header which says ``#pragma once``, which is
+expanded only the first time. The total number of tokens the parser sees
+and the time taken to parse are shown for each.
+
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from cycy.include import DirectoryIncluder, HeaderCache
+from cycy.parser.core import Parser
+from cycy.parser.preprocessor import Preprocessor
+
+
+def write(directory, name, contents):
+    with open(os.path.join(directory, name), "w") as file:
+        file.write(contents)
+
+
+def corpus(directory, headers, declarations, once):
+    base = "".join(
+        "int base%s(int x, int y);\n" % (i,) for i in range(declarations)
+    )
+    if once:
+        base = "#pragma once\n" + base
+    write(directory, "base.h", base)
+    for i in range(headers):
+        write(
+            directory,
+            "header%s.h" % (i,),
+            '#include "base.h"\nint header%s(void);\n' % (i,),
+        )
+    return "".join(
+        '#include "header%s.h"\n' % (i,) for i in range(headers)
+    ) + "int main(void) { return 0; }\n"
+
+
+def measured(directory, source):
+    parser = Parser(
+        preprocessor=Preprocessor(
+            includers=[DirectoryIncluder(path=directory, cache=HeaderCache())],
+        ),
+    )
+    count = 0
+    for _ in parser.preprocessor.preprocessed(parser.lexer.lex(source), parser):
+        count += 1
+
+    start = time.time()
+    parser.parse(source)
+    return count, time.time() - start
+
+
+def main(argv):
+    headers, declarations = 30, 1000
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--headers":
+            headers = int(next(arguments))
+        elif argument == "--declarations":
+            declarations = int(next(arguments))
+
+    for name, once in [("unguarded", False), ("pragma once", True)]:
+        directory = tempfile.mkdtemp()
+        try:
+            source = corpus(directory, headers, declarations, once)
+            count, elapsed = measured(directory, source)
+        finally:
+            shutil.rmtree(directory)
+        sys.stdout.write(
+            "%-12s %10d tokens %8.3fs\n" % (name, count, elapsed),
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+"""
+Measure the throughput of the lexer, in MB/s.
+
+Usage
+=====
+
+python benchmarks/lexer.py [options]
+
+
+Options
+-------
+
+--size N          how many MB of C to generate and lex (default 4)
+--repeat N        lex it N times and report the best (default 3)
+
+Generated C of the given size is lexed by both the hand-written lexer
+and the regular expression one it replaced, in this process (so run it
+under PyPy for numbers closer to those of a translated CyCy).
+
+"""
+
+import sys
+import time
+
+from cycy.parser.lexer import lexer, regex_lexer
+
+
+FUNCTION = """
+int function_%(i)s(int count, const char * string) {
+    int total = %(i)s;
+    while (count <= 1000) {
+        total = total + string[count] - 'a';
+        count = count + 1;
+    }
+    puts("a string literal, with a comma");
+    return total;
+}
+"""
+
+
+def generate(size):
+    chunks = []
+    length = 0
+    i = 0
+    while length < size:
+        chunk = FUNCTION % {"i": i}
+        chunks.append(chunk)
+        length += len(chunk)
+        i += 1
+    return "".join(chunks)
+
+
+def throughput(lexer, source, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        for _ in lexer.lex(source):
+            pass
+        timings.append(time.time() - start)
+    return len(source) / min(timings) / 1024 / 1024
+
+
+def main(argv):
+    size = 4
+    repeat = 3
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--size":
+            size = float(next(arguments))
+        elif argument == "--repeat":
+            repeat = int(next(arguments))
+
+    source = generate(size * 1024 * 1024)
+    for name, each in [("hand-written", lexer), ("regex", regex_lexer)]:
+        sys.stdout.write(
+            "%-20s %8.2f MB/s\n" % (name, throughput(each, source, repeat)),
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+"""
+Compare the peak memory use and time of lexing a large file, read whole,
+read a chunk at a time, or memory mapped.
+
+Usage
+=====
+
+python benchmarks/mapped.py [options]
+
+
+Options
+-------
+
+--megabytes N     how large a C file to generate and lex (default 200)
+
+Each way of lexing runs in a fresh process, so that its peak resident set
+size (as reported by getrusage) is its own. Tokens are counted and then
+dropped rather than kept, so the peak is the cost of getting at the
+source. Pages of a mapped file which have been touched count towards the
+resident set size, but unlike a string read into memory, the kernel can
+reclaim them.
+
+The ``-compact`` modes instead keep every token, in a TokenList, as the
+parser does. Kept from a mapping, only the offsets of identifiers and
+literals are kept, not their text.
+
+Untranslated, copying chunks out of the mapping goes through ll2ctypes a
+character at a time, so the mmap numbers are only meaningful once
+translated (try a few megabytes untranslated).
+
+"""
+
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from rpython.rlib.streamio import open_file_as_stream
+
+from cycy.parser.lexer import lexer
+
+
+FUNCTION = """
+int f%s(int x) {
+    int y = 12;
+    while (x != 0) {
+        x = x - 1;
+        puts("counting down");
+    }
+    return x + y;
+}
+"""
+
+
+def generate(path, megabytes):
+    size = megabytes * 1024 * 1024
+    with open(path, "w") as file:
+        i = 0
+        while file.tell() < size:
+            file.write("".join(FUNCTION % (j,) for j in range(i, i + 1000)))
+            i += 1000
+
+
+def readall(path):
+    stream = open_file_as_stream(path)
+    try:
+        source = stream.readall()
+    finally:
+        stream.close()
+    return lexer.lex(source)
+
+
+def streamed(path):
+    return lexer.lex_stream(open_file_as_stream(path))
+
+
+def readall_compact(path):
+    return readall(path).compact().types
+
+
+def mapped_compact(path):
+    return lexer.lex_mapped(path).compact().types
+
+
+MODES = [
+    ("readall", readall),
+    ("stream", streamed),
+    ("mmap", lexer.lex_mapped),
+    ("readall-compact", readall_compact),
+    ("mmap-compact", mapped_compact),
+]
+
+
+def run(mode, path):
+    lex = dict(MODES)[mode]
+    start = time.time()
+    count = 0
+    for _ in lex(path):
+        count += 1
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sys.stdout.write(
+        "%-16s %10d tokens %8.2fs %8.1f MB peak RSS\n" % (
+            mode, count, elapsed, peak / 1024.0,
+        ),
+    )
+
+
+def main(argv):
+    megabytes = 200
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--megabytes":
+            megabytes = int(next(arguments))
+        elif argument == "--run":
+            return run(mode=next(arguments), path=next(arguments))
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "large.c")
+        generate(path, megabytes)
+        for mode, _ in MODES:
+            sys.stdout.flush()
+            subprocess.check_call(
+                [sys.executable, __file__, "--run", mode, path],
+            )
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,122 @@
+"""
+Count the adjacent pairs of opcodes run in the benchmarks.
+
+Usage
+=====
+
+python benchmarks/opcode_pairs.py [options] [C_FILE ...]
+
+
+Options
+-------
+
+-O               optimise the compiled bytecode first, as ``cycy -O`` does
+
+Runs the given C files (by default, the benchmarks in this directory)
+untranslated, counting each pair of opcodes dispatched one after the other
+by the interpreter loop, and reports the totals, most frequent first. The
+pairs which dominate are the candidates for superinstructions. Pairs which
+start with a ``CALL`` or ``RETURN`` are left out, since their second opcode
+is in another function, so the two can't be fused. Each benchmark counts
+equally, as in ``opcode_profile.py``.
+
+"""
+
+from collections import Counter
+import os
+import sys
+
+from rpython.rlib import streamio
+
+from cycy import bytecode
+from cycy.compiler import Compiler
+from cycy.interpreter import CyCy
+from cycy.linker import link
+from cycy.parser import preprocessor
+from cycy.parser.core import Parser
+from cycy.stdlib.library import LIBRARY
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# the opcodes after which the next one dispatched is in another function
+_LEAVING = [bytecode.CALL, bytecode.RETURN]
+
+
+def corpus():
+    return [
+        os.path.join(HERE, name)
+        for name in sorted(os.listdir(HERE))
+        if name.endswith(".c")
+    ]
+
+
+def pairs(path, optimize):
+    counts = Counter()
+    opcode_of = bytecode.opcode_of
+    previous = [None]
+
+    def counting_opcode_of(word):
+        opcode = opcode_of(word)
+        if previous[0] is not None and previous[0] not in _LEAVING:
+            counts[previous[0], opcode] += 1
+        previous[0] = opcode
+        return opcode
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    cycy = CyCy(
+        compiler=Compiler(peephole=optimize),
+        parser=Parser(
+            preprocessor=preprocessor.with_directories(
+                [os.path.join(ROOT, "include")],
+            ),
+        ),
+        stdout=streamio.BufferingOutputStream(streamio.DiskFile(devnull)),
+    )
+    with open(path) as source:
+        program = source.read()
+
+    # Compile before counting, so that only opcodes the loop runs count.
+    w_main = link([cycy.compile(program)], libraries=LIBRARY)["main"]
+    bytecode.opcode_of = counting_opcode_of
+    try:
+        w_main.call(arguments=[], interpreter=cycy)
+        cycy.flush()
+    finally:
+        bytecode.opcode_of = opcode_of
+        os.close(devnull)
+    return counts
+
+
+def main(argv):
+    optimize = False
+    paths = []
+    for argument in argv:
+        if argument == "-O":
+            optimize = True
+        else:
+            paths.append(argument)
+
+    counts = Counter()
+    shares = Counter()
+    for path in paths or corpus():
+        ran = pairs(path, optimize=optimize)
+        total = float(sum(ran.values()))
+        for pair, count in ran.iteritems():
+            counts[pair] += count
+            shares[pair] += count / total
+
+    runs = float(sum(shares.values()))
+    for (first, second), share in shares.most_common():
+        sys.stdout.write(
+            "%-40s %10d %5.1f%%\n" % (
+                bytecode.NAMES[first] + " " + bytecode.NAMES[second],
+                counts[first, second],
+                100 * share / runs,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
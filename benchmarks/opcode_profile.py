@@ -0,0 +1,103 @@
+"""
+Count how many times each opcode runs in the benchmarks.
+
+Usage
+=====
+
+python benchmarks/opcode_profile.py [options] [C_FILE ...]
+
+
+Options
+-------
+
+-O               optimise the compiled bytecode first, as ``cycy -O`` does
+
+Runs the given C files (by default, the benchmarks in this directory)
+untranslated, counting each opcode dispatched by the interpreter loop, and
+reports the totals, most frequent first. ``CyCy.run`` tests for opcodes in
+this order. Each benchmark counts equally, whatever its length, so that the
+longest running one doesn't decide the order alone.
+
+"""
+
+from collections import Counter
+import os
+import sys
+
+from rpython.rlib import streamio
+
+from cycy import bytecode
+from cycy.compiler import Compiler
+from cycy.interpreter import CyCy
+from cycy.parser import preprocessor
+from cycy.parser.core import Parser
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def corpus():
+    return [
+        os.path.join(HERE, name)
+        for name in sorted(os.listdir(HERE))
+        if name.endswith(".c")
+    ]
+
+
+def profile(path, optimize):
+    counts = Counter()
+    opcode_of = bytecode.opcode_of
+
+    def counting_opcode_of(word):
+        opcode = opcode_of(word)
+        counts[opcode] += 1
+        return opcode
+
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    cycy = CyCy(
+        compiler=Compiler(peephole=optimize),
+        parser=Parser(
+            preprocessor=preprocessor.with_directories(
+                [os.path.join(ROOT, "include")],
+            ),
+        ),
+        stdout=streamio.BufferingOutputStream(streamio.DiskFile(devnull)),
+    )
+    with open(path) as source:
+        program = source.read()
+
+    bytecode.opcode_of = counting_opcode_of
+    try:
+        cycy.interpret([program])
+    finally:
+        bytecode.opcode_of = opcode_of
+        os.close(devnull)
+    return counts
+
+
+def main(argv):
+    optimize = False
+    paths = []
+    for argument in argv:
+        if argument == "-O":
+            optimize = True
+        else:
+            paths.append(argument)
+
+    shares = Counter()
+    for path in paths or corpus():
+        counts = profile(path, optimize=optimize)
+        total = float(sum(counts.values()))
+        for opcode, count in counts.iteritems():
+            shares[opcode] += count / total
+
+    runs = float(sum(shares.values()))
+    for opcode, share in shares.most_common():
+        sys.stdout.write(
+            "%-20s %5.1f%%\n" % (bytecode.NAMES[opcode], 100 * share / runs),
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,10 @@
+int main(void) {
+    int i = 0;
+    int x = 0;
+    int y = 1;
+    while (i != 1000000) {
+        x = 2 + y;
+        i = i + 1;
+    }
+    return 0;
+}
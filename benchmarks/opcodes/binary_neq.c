@@ -0,0 +1,9 @@
+int main(void) {
+    int i = 0;
+    int x = 1;
+    while (i != 1000000) {
+        i != x;
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,12 @@
+int f(int x) {
+    return x;
+}
+
+int main(void) {
+    int i = 0;
+    while (i != 1000000) {
+        f(i);
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,9 @@
+int main(void) {
+    int i = 0;
+    const char* s = "cycy";
+    while (i != 1000000) {
+        s[2];
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,12 @@
+int main(void) {
+    int i = 0;
+    int x = 0;
+    while (i != 1000000) {
+        while (x <= 0) {
+            x = 1;
+        }
+        x = 0;
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,9 @@
+int main(void) {
+    int i = 0;
+
+    while (i != 1000000) {
+        1;
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,7 @@
+int main(void) {
+    int i = 0;
+    while (i != 1000000) {
+        i = i + 1;
+    }
+    return 0;
+}
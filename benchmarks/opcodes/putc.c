@@ -0,0 +1,8 @@
+int main(void) {
+    int i = 0;
+    while (i != 1000000) {
+        putchar('.');
+        i = i + 1;
+    }
+    return 0;
+}
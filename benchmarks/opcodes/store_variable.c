@@ -0,0 +1,9 @@
+int main(void) {
+    int i = 0;
+    int x = 0;
+    while (i != 1000000) {
+        x = i;
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,75 @@
+"""
+Check that parsing takes time linear in the size of a program.
+
+Usage
+=====
+
+python benchmarks/parser.py [options]
+
+
+Options
+-------
+
+--sizes N,...     how many statements to generate each program with
+                  (default 10000,100000,1000000)
+
+Two programs of each size are parsed, in this process: one with a single
+function containing every statement (a long list of statements), and one
+with a function for every 10 statements (a long list of top-level units).
+If parsing is linear, the time per statement stays constant as the size
+grows.
+
+"""
+
+import sys
+import time
+
+from cycy.parser.core import Parser
+
+
+STATEMENT = "    x = x + %s;\n"
+
+
+def function(i, statements):
+    body = "".join(STATEMENT % (j,) for j in range(statements))
+    return "int f%s(int x) {\n%s    return x;\n}\n" % (i, body)
+
+
+def one_function(size):
+    return function(0, size)
+
+
+def many_functions(size):
+    return "".join(function(i, 10) for i in range(size // 10))
+
+
+def timed(source):
+    parser = Parser()
+    start = time.time()
+    parser.parse(source)
+    return time.time() - start
+
+
+def main(argv):
+    sizes = [10000, 100000, 1000000]
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--sizes":
+            sizes = [int(size) for size in next(arguments).split(",")]
+
+    for size in sizes:
+        for name, generate in [
+            ("statements", one_function),
+            ("units", many_functions),
+        ]:
+            elapsed = timed(generate(size))
+            sys.stdout.write(
+                "%-12s %8d %8.2fs %8.2fus/statement\n" % (
+                    name, size, elapsed, elapsed / size * 1000000,
+                ),
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
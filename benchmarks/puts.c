@@ -0,0 +1,18 @@
+int puts(const char * string) {
+    int i = 0;
+    while (string[i] != 0) {
+        putchar(string[i]);
+        i = i + 1;
+    }
+    putchar('\n');
+    return i + 1;
+}
+
+int main(void) {
+    int line = 0;
+    while (line <= 40000) {
+        puts("The quick brown fox jumps over the lazy dog, again and again.");
+        line = line + 1;
+    }
+    return 0;
+}
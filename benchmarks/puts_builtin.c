@@ -0,0 +1,10 @@
+#include "cycy/stdio.h"
+
+int main(void) {
+    int line = 0;
+    while (line <= 40000) {
+        puts("The quick brown fox jumps over the lazy dog, again and again.");
+        line = line + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,123 @@
+"""
+Time rebuilding a multi-file program after changing one of its files.
+
+Usage
+=====
+
+python benchmarks/rebuild.py [options]
+
+
+Options
+-------
+
+--cycy PATH       the CyCy executable to benchmark (by default, run
+                  untranslated via ``python -m cycy``)
+--repeat N        run each N times and report the best (default 3)
+--files N         how many files the generated program has (default 50)
+
+Each generated file defines one function, which calls the one defined by
+the previous file. Reported are:
+
+* a full build, compiling every file to an object file and then linking
+  the objects and running the program
+* a rebuild after changing one file, compiling just that file again
+* running the C files directly, where the bytecode cache means only the
+  changed file is recompiled
+
+"""
+
+import shutil
+import sys
+import tempfile
+import os
+
+from bench import time_one
+
+
+FIRST = "int f0(int x) { return x; }\n"
+
+NEXT = """
+int f%(previous)s(int x);
+
+int f%(i)s(int x) {
+    int y = %(change)s;
+    return f%(previous)s(x + y);
+}
+"""
+
+MAIN = """
+int f%(last)s(int x);
+
+int main(void) {
+    f%(last)s(0);
+    return 0;
+}
+"""
+
+
+def write_program(directory, files):
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, "f%s.c" % (i,))
+        write_unit(path, i, change=1)
+        paths.append(path)
+
+    main = os.path.join(directory, "main.c")
+    with open(main, "w") as source:
+        source.write(MAIN % {"last": files - 1})
+    paths.append(main)
+    return paths
+
+
+def write_unit(path, i, change):
+    with open(path, "w") as source:
+        if i == 0:
+            source.write(FIRST)
+        else:
+            source.write(NEXT % {"i": i, "previous": i - 1, "change": change})
+
+
+def objects(paths):
+    return [path[:-len(".c")] + ".cyo" for path in paths]
+
+
+def main(argv):
+    cycy = [sys.executable, "-m", "cycy"]
+    repeat = 3
+    files = 50
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--cycy":
+            cycy = [next(arguments)]
+        elif argument == "--repeat":
+            repeat = int(next(arguments))
+        elif argument == "--files":
+            files = int(next(arguments))
+
+    directory = tempfile.mkdtemp()
+    try:
+        paths = write_program(directory, files)
+        changed = paths[files // 2]
+        run = cycy + objects(paths)
+
+        full = time_one(cycy + ["--compile"] + paths, repeat=repeat)
+        full += time_one(run, repeat=repeat)
+
+        write_unit(changed, files // 2, change=2)
+        rebuild = time_one(cycy + ["--compile", changed], repeat=repeat)
+        rebuild += time_one(run, repeat=repeat)
+
+        time_one(cycy + paths, repeat=1)  # prime the cache
+        write_unit(changed, files // 2, change=3)
+        start = time_one(cycy + paths, repeat=1)
+    finally:
+        shutil.rmtree(directory)
+
+    sys.stdout.write("%-30s %8.3fs\n" % ("full build", full))
+    sys.stdout.write("%-30s %8.3fs\n" % ("rebuild one object", rebuild))
+    sys.stdout.write("%-30s %8.3fs\n" % ("run with one file changed", start))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,116 @@
+"""
+Time how long CyCy takes to start up with and without its bytecode cache.
+
+Usage
+=====
+
+python benchmarks/startup.py [options]
+
+
+Options
+-------
+
+--cycy PATH       the CyCy executable to benchmark (by default, run
+                  untranslated via ``python -m cycy``)
+--repeat N        run each N times and report the best (default 3)
+--functions N     how many functions the generated program has (default 200)
+
+A program consisting of many small functions and a trivial ``main`` is
+generated, so that nearly all of the time is spent before ``main`` runs.
+Cold runs pass ``--no-cache``, warm ones reuse the bytecode cached by an
+earlier run.
+
+A hello world using ``puts`` is also timed, with the prebuilt standard
+library, and with the standard library's header and source instead read
+from disk and compiled each run.
+
+"""
+
+import shutil
+import sys
+import tempfile
+import os
+
+from bench import time_one
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HELLO = """
+#include "cycy/stdio.h"
+
+int main(void) {
+    puts("Hello, world!");
+    return 0;
+}
+"""
+
+
+FUNCTION = """
+int f%(i)s(int x) {
+    int y = x + %(i)s;
+    while (y != 0) {
+        y = y - 1;
+    }
+    return y;
+}
+"""
+
+
+def program(functions):
+    source = [FUNCTION % {"i": i} for i in range(functions)]
+    source.append("int main(void) {\n    return f0(0);\n}\n")
+    return "".join(source)
+
+
+def main(argv):
+    cycy = [sys.executable, "-m", "cycy"]
+    repeat = 3
+    functions = 200
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == "--cycy":
+            cycy = [next(arguments)]
+        elif argument == "--repeat":
+            repeat = int(next(arguments))
+        elif argument == "--functions":
+            functions = int(next(arguments))
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "startup.c")
+        with open(path, "w") as source:
+            source.write(program(functions))
+
+        cold = time_one(cycy + ["--no-cache", path], repeat=repeat)
+        time_one(cycy + [path], repeat=1)  # prime the cache
+        warm = time_one(cycy + [path], repeat=repeat)
+
+        hello = os.path.join(directory, "hello.c")
+        with open(hello, "w") as source:
+            source.write(HELLO)
+        prebuilt = time_one(cycy + ["--no-cache", hello], repeat=repeat)
+        from_source = time_one(
+            cycy + [
+                "--no-cache",
+                "-I", os.path.join(ROOT, "include"),
+                hello,
+                os.path.join(ROOT, "lib", "cycy", "stdio.c"),
+            ],
+            repeat=repeat,
+        )
+    finally:
+        shutil.rmtree(directory)
+
+    for name, timing in [
+        ("cold", cold),
+        ("warm", warm),
+        ("hello, prebuilt stdlib", prebuilt),
+        ("hello, stdlib from source", from_source),
+    ]:
+        sys.stdout.write("%-30s %8.3fs\n" % (name, timing))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,11 @@
+#include "cycy/string.h"
+
+int main(void) {
+    int total = 0;
+    int i = 0;
+    while (i <= 40000) {
+        total = total + strlen("The quick brown fox jumps over the lazy dog.");
+        i = i + 1;
+    }
+    return 0;
+}
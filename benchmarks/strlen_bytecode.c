@@ -0,0 +1,17 @@
+int strlen(const char * string) {
+    int i = 0;
+    while (string[i] != 0) {
+        i = i + 1;
+    }
+    return i;
+}
+
+int main(void) {
+    int total = 0;
+    int i = 0;
+    while (i <= 40000) {
+        total = total + strlen("The quick brown fox jumps over the lazy dog.");
+        i = i + 1;
+    }
+    return 0;
+}
@@ -0,0 +1,116 @@
+"""
+Native implementations of hot C library functions.
+
+A call to one of these which the program doesn't define is linked (see
+:mod:`cycy.linker`) into a ``CALL_BUILTIN`` of its index in
+:data:`BUILTINS`, which runs the function directly rather than setting up a
+frame to interpret bytecode. A builtin takes precedence over the standard
+library's definition of the same function, if it has one.
+
+"""
+
+from characteristic import Attribute, attributes
+
+from cycy.objects import W_Int32, W_String
+
+
+@attributes(
+    [Attribute(name="name"), Attribute(name="arity")],
+    apply_with_init=False,
+)
+class Builtin(object):
+    """
+    A C function implemented in RPython.
+
+    Its implementation takes the interpreter and a list of the (boxed)
+    arguments, and returns the (boxed) return value.
+
+    """
+
+    _immutable_fields_ = ["name", "arity", "implementation"]
+
+    def __init__(self, name, arity, implementation):
+        self.name = name
+        self.arity = arity
+        self.implementation = implementation
+
+    def call(self, interpreter, arguments):
+        return self.implementation(interpreter, arguments)
+
+
+BUILTINS = []
+_INDICES = {}
+
+
+def builtin(name, arity):
+    def register(implementation):
+        _INDICES[name] = len(BUILTINS)
+        BUILTINS.append(
+            Builtin(name=name, arity=arity, implementation=implementation),
+        )
+        return implementation
+    return register
+
+
+def index_of(name):
+    """
+    The index of the builtin with the given name, or -1 if there isn't one.
+
+    """
+
+    return _INDICES.get(name, -1)
+
+
+def _c_string(w_string):
+    assert isinstance(w_string, W_String)
+    value = w_string.value
+    end = value.find("\0")
+    if end < 0:
+        return value
+    return value[:end]
+
+
+@builtin("puts", arity=1)
+def puts(interpreter, arguments):
+    string = _c_string(arguments[0])
+    interpreter.stdout.write(string)
+    interpreter.stdout.write("\n")
+    return W_Int32(len(string) + 1)
+
+
+@builtin("strlen", arity=1)
+def strlen(interpreter, arguments):
+    return W_Int32(len(_c_string(arguments[0])))
+
+
+@builtin("strcmp", arity=2)
+def strcmp(interpreter, arguments):
+    left = _c_string(arguments[0])
+    right = _c_string(arguments[1])
+    for i in xrange(min(len(left), len(right))):
+        if left[i] != right[i]:
+            return W_Int32(ord(left[i]) - ord(right[i]))
+    if len(left) < len(right):
+        return W_Int32(-ord(right[len(left)]))
+    elif len(left) > len(right):
+        return W_Int32(ord(left[len(right)]))
+    return W_Int32(0)
+
+
+@builtin("abs", arity=1)
+def abs_(interpreter, arguments):
+    value = arguments[0].rint()
+    if value < 0:
+        value = -value
+    return W_Int32(value)
+
+
+@builtin("getchar", arity=0)
+def getchar(interpreter, arguments):
+    # Show any prompt still buffered before waiting for input, as C's
+    # stdio does.
+    interpreter.flush()
+    char = interpreter.stdin.read(1)
+    if not char:
+        return W_Int32(-1)  # EOF
+    return W_Int32(ord(char[0]))
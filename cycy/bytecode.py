@@ -1,5 +1,9 @@
 from characteristic import Attribute, attributes
 
+from cycy import builtins
+from cycy.exceptions import CyCyError
+from cycy.objects import W_Function
+
 
 LOAD_CONST = 1
 BINARY_NEQ = 2
@@ -13,10 +17,27 @@ JUMP             = 8
 JUMP_IF_NOT_ZERO = 9
 JUMP_IF_ZERO     = 14
 
+# compare the top two values, and jump if the comparison is false
+JUMP_IF_NOT_LEQ = 17
+JUMP_IF_EQ      = 18
+
+JUMPS = [JUMP, JUMP_IF_NOT_ZERO, JUMP_IF_ZERO, JUMP_IF_NOT_LEQ, JUMP_IF_EQ]
+
 CALL = 10
+CALL_BUILTIN = 25  # call the native function (see cycy.builtins) at arg
 BINARY_ADD = 11
 BINARY_SUB = 12
 DEREFERENCE = 13
+POP = 15
+DUP = 16
+
+# superinstructions (see benchmarks/opcode_pairs.py)
+INC_VARIABLE = 19  # x = x + 1
+DEC_VARIABLE = 20  # x = x - 1
+ADD_CONST    = 21  # LOAD_CONST c; <left>; BINARY_ADD
+SUB_CONST    = 22  # LOAD_CONST c; <left>; BINARY_SUB
+ADD_VARIABLE = 23  # <right>; LOAD_VARIABLE x; BINARY_ADD
+SUB_VARIABLE = 24  # <right>; LOAD_VARIABLE x; BINARY_SUB
 
 NAMES = {
     LOAD_CONST: "LOAD_CONST",
@@ -29,10 +50,21 @@ NAMES = {
     JUMP_IF_NOT_ZERO: "JUMP_IF_NOT_ZERO",
     JUMP: "JUMP",
     CALL: "CALL",
+    CALL_BUILTIN: "CALL_BUILTIN",
     BINARY_ADD: "BINARY_ADD",
     BINARY_SUB: "BINARY_SUB",
     DEREFERENCE: "DEREFERENCE",
     JUMP_IF_ZERO: "JUMP_IF_ZERO",
+    POP: "POP",
+    DUP: "DUP",
+    JUMP_IF_NOT_LEQ: "JUMP_IF_NOT_LEQ",
+    JUMP_IF_EQ: "JUMP_IF_EQ",
+    INC_VARIABLE: "INC_VARIABLE",
+    DEC_VARIABLE: "DEC_VARIABLE",
+    ADD_CONST: "ADD_CONST",
+    SUB_CONST: "SUB_CONST",
+    ADD_VARIABLE: "ADD_VARIABLE",
+    SUB_VARIABLE: "SUB_VARIABLE",
 }
 
 
@@ -44,9 +76,166 @@ BINARY_OPERATION_BYTECODE = {
 }
 
 
+# The fused opcode which jumps if the given comparison is false.
+JUMP_IF_NOT_BYTECODE = {
+    "<=": JUMP_IF_NOT_LEQ,
+    "!=": JUMP_IF_EQ,
+}
+
+
 NO_ARG = -42
 
 
+# Each instruction is packed into a single integer word, its opcode in the
+# low bits and its (signed) argument in the rest. Offsets into the
+# instructions still count two per instruction, as if the opcode and
+# argument each took up a slot.
+OPCODE_BITS = 8
+OPCODE_MASK = (1 << OPCODE_BITS) - 1
+
+
+def pack(opcode, arg):
+    assert 0 <= opcode <= OPCODE_MASK
+    return (arg << OPCODE_BITS) | opcode
+
+
+def opcode_of(word):
+    return word & OPCODE_MASK
+
+
+def arg_of(word):
+    return word >> OPCODE_BITS
+
+
+# The opcodes whose argument is an index into the constants.
+CONSTANT_OPCODES = [LOAD_CONST, CALL, ADD_CONST, SUB_CONST]
+
+
+# How many values each opcode pops, and then pushes. CALL and CALL_BUILTIN
+# pop as many values as their function has arguments, and RETURN pops its
+# argument.
+STACK_EFFECTS = {
+    LOAD_CONST: (0, 1),
+    BINARY_NEQ: (2, 1),
+    PUTC: (1, 1),
+    BINARY_LEQ: (2, 1),
+    STORE_VARIABLE: (1, 0),
+    LOAD_VARIABLE: (0, 1),
+    JUMP: (0, 0),
+    JUMP_IF_NOT_ZERO: (1, 0),
+    JUMP_IF_ZERO: (1, 0),
+    JUMP_IF_NOT_LEQ: (2, 0),
+    JUMP_IF_EQ: (2, 0),
+    BINARY_ADD: (2, 1),
+    BINARY_SUB: (2, 1),
+    DEREFERENCE: (2, 1),
+    POP: (1, 0),
+    DUP: (1, 2),
+    INC_VARIABLE: (0, 0),
+    DEC_VARIABLE: (0, 0),
+    ADD_CONST: (1, 1),
+    SUB_CONST: (1, 1),
+    ADD_VARIABLE: (1, 1),
+    SUB_VARIABLE: (1, 1),
+}
+
+
+@attributes(
+    [Attribute(name="offset"), Attribute(name="message")],
+    apply_with_init=False,
+)
+class InvalidBytecode(CyCyError):
+    def __init__(self, offset, message):
+        self.offset = offset
+        self.message = message
+
+    def __str__(self):
+        return "Invalid bytecode at offset %s: %s" % (
+            self.offset, self.message,
+        )
+
+
+def stack_size(tape, constants):
+    """
+    Verify the stack effects of the instructions on a tape, returning the
+    deepest the operand stack can get while running them.
+
+    Raises :class:`InvalidBytecode` if an instruction could pop from an
+    empty stack, a jump leaves the tape, or the stack could be different
+    depths when reaching the same instruction along different paths.
+
+    """
+
+    count = len(tape) // 2
+    depths = [-1] * count
+    deepest = 0
+
+    pending = []
+    if count:
+        depths[0] = 0
+        pending.append(0)
+
+    while pending:
+        i = pending.pop()
+        offset = 2 * i
+        opcode = tape[offset]
+        arg = tape[offset + 1]
+        depth = depths[i]
+
+        if opcode == RETURN:
+            if depth < arg:
+                raise InvalidBytecode(offset, "RETURN from an empty stack")
+            continue
+        elif opcode in CONSTANT_OPCODES and not 0 <= arg < len(constants):
+            raise InvalidBytecode(offset, "no constant %s" % (arg,))
+
+        if opcode == CALL:
+            w_function = constants[arg]
+            if not isinstance(w_function, W_Function):
+                raise InvalidBytecode(offset, "CALL of a non-function")
+            pops, pushes = w_function.arity, 1
+        elif opcode == CALL_BUILTIN:
+            if not 0 <= arg < len(builtins.BUILTINS):
+                raise InvalidBytecode(offset, "no builtin %s" % (arg,))
+            pops, pushes = builtins.BUILTINS[arg].arity, 1
+        elif opcode in STACK_EFFECTS:
+            pops, pushes = STACK_EFFECTS[opcode]
+        else:
+            raise InvalidBytecode(offset, "unknown opcode %s" % (opcode,))
+
+        if depth < pops:
+            raise InvalidBytecode(
+                offset, "%s pops from an empty stack" % (NAMES[opcode],),
+            )
+        depth = depth - pops + pushes
+        if depth > deepest:
+            deepest = depth
+
+        successors = []
+        if opcode != JUMP:
+            successors.append(i + 1)
+        if opcode in JUMPS:
+            if arg < 0 or arg % 2 or arg // 2 > count:
+                raise InvalidBytecode(offset, "jump to %s" % (arg,))
+            successors.append(arg // 2)
+
+        for successor in successors:
+            if successor == count:
+                continue  # running off the end of the tape
+            elif depths[successor] == -1:
+                depths[successor] = depth
+                pending.append(successor)
+            elif depths[successor] != depth:
+                raise InvalidBytecode(
+                    2 * successor,
+                    "reached with stack depths %s and %s" % (
+                        depths[successor], depth,
+                    ),
+                )
+
+    return deepest
+
+
 @attributes(
     [
         Attribute(name="tape"),
@@ -62,10 +251,25 @@ class Bytecode(object):
     The bytecode, man.
 
     .. attribute:: tape
+    .. attribute:: unoptimized_tape
+
+        the tape as it was compiled, if it has since been optimised
+        (see :mod:`cycy.peephole`), otherwise None
+
+    .. attribute:: instructions
+
+        the instructions on the tape, frozen for the interpreter, one
+        packed word (see :func:`pack`) per instruction
+
     .. attribute:: arguments
 
         a tuple of argument names
 
+    .. attribute:: stack_size
+
+        the deepest the operand stack gets while running the instructions,
+        as verified by :func:`stack_size`
+
     .. attribute:: constants
 
         inherited from the :class:`cycy.compiler.Context` that produced this
@@ -73,8 +277,9 @@ class Bytecode(object):
 
     .. attribute:: variables
 
-        a mapping between variable names (:class:`str`\ s) and the
-        indices in an array that they should be assigned to
+        the names of the function's variables (:class:`str`\ s), indexed by
+        the slot in the frame they are assigned to, starting with the
+        arguments
 
     .. attribute:: name
 
@@ -82,31 +287,77 @@ class Bytecode(object):
 
     """
 
-    def __init__(self, tape, arguments, constants, variables, name):
+    _immutable_fields_ = [
+        "tape",
+        "unoptimized_tape",
+        "instructions[*]",
+        "stack_size",
+        "name",
+        "arguments[*]",
+        "constants",
+        "variables",
+    ]
+
+    def __init__(
+        self,
+        tape,
+        arguments,
+        constants,
+        variables,
+        name,
+        unoptimized_tape=None,
+    ):
         self.tape = tape
+        self.unoptimized_tape = unoptimized_tape
+        self.instructions = tape.instructions()
+        self.stack_size = stack_size(tape, constants)
         self.name = name
         self.arguments = arguments
         self.constants = constants
         self.variables = variables
 
+    def call_builtin(self, index, builtin):
+        """
+        Turn calls of the (placeholder) function at the given index in the
+        constants into calls of the builtin at the given index in
+        :data:`cycy.builtins.BUILTINS`.
+
+        The linker does this for functions which no translation unit or
+        library defines, before the bytecode is ever run. The builtin must
+        take as many arguments as the placeholder, so the stack size is
+        unchanged.
+
+        """
+
+        tape = self.tape
+        for offset in xrange(0, len(tape), 2):
+            if tape[offset] == CALL and tape[offset + 1] == index:
+                tape[offset] = CALL_BUILTIN
+                tape[offset + 1] = builtin
+        self.instructions = tape.instructions()
+
     def __iter__(self):
         """Yield (offset, byte_code, arg) tuples.
 
         The `byte_code` will be one of the constants defined above,
         and `arg` may be None. `byte_code` and `arg` will be ints.
         """
-        offset = 0
-        while offset < len(self.tape):
-            byte_code = self.tape[offset]
-            arg = self.tape[offset + 1]
+        return _iter_tape(self.tape)
+
+    def dump(self, pretty=True, optimized=True):
+        """
+        Dump the instructions, or with ``optimized=False``, the instructions
+        as they were before being optimised.
+
+        """
 
-            yield (offset, byte_code, arg)
-            offset += 2
+        tape = self.tape
+        if not optimized and self.unoptimized_tape is not None:
+            tape = self.unoptimized_tape
 
-    def dump(self, pretty=True):
         lines = []
 
-        for offset, byte_code, arg in self:
+        for offset, byte_code, arg in _iter_tape(tape):
             name = NAMES[byte_code]
             str_arg = ""
             if arg != NO_ARG:
@@ -114,13 +365,19 @@ class Bytecode(object):
 
             line = "%s %s %s" % (str(offset), name, str_arg)
             if pretty:
-                if byte_code in (LOAD_CONST, CALL):
+                if byte_code in (LOAD_CONST, CALL, ADD_CONST, SUB_CONST):
                     line += " => " + self.constants[arg].dump()
-                elif byte_code in (STORE_VARIABLE, LOAD_VARIABLE):
-                    for name, index in self.variables.items():
-                        if index == arg:
-                            line += " => " + name
-                            break
+                elif byte_code == CALL_BUILTIN:
+                    line += " => " + builtins.BUILTINS[arg].name
+                elif byte_code in (
+                    STORE_VARIABLE,
+                    LOAD_VARIABLE,
+                    INC_VARIABLE,
+                    DEC_VARIABLE,
+                    ADD_VARIABLE,
+                    SUB_VARIABLE,
+                ):
+                    line += " => " + self.variables[arg]
                 elif byte_code == RETURN:
                     if arg:
                         line += " (top of stack)"
@@ -128,9 +385,22 @@ class Bytecode(object):
                         line += " (void return)"
             lines.append(line.strip())
 
+        if pretty:
+            lines.append("(%s constants in pool)" % len(self.constants))
+
         return "\n".join(lines)
 
 
+def _iter_tape(tape):
+    offset = 0
+    while offset < len(tape):
+        byte_code = tape[offset]
+        arg = tape[offset + 1]
+
+        yield (offset, byte_code, arg)
+        offset += 2
+
+
 def cleaned(humanish_bytecode):
     """
     Take bytecode in a humanish format::
@@ -0,0 +1,195 @@
+"""
+An on-disk cache of compiled bytecode, much like Python's ``__pycache__``.
+
+The bytecode compiled from ``path/to/prog.c`` is saved in
+``path/to/__cycycache__/prog.cycyc`` (or ``prog.opt.cycyc`` when optimised),
+along with digests of the source and of every file it included, and the
+paths searched for those files which didn't exist. It is only loaded again
+if none of them have changed since (and none of the missing files would
+now be included instead).
+
+"""
+
+import errno
+import os
+
+from characteristic import attributes
+from rpython.rlib.rmd5 import RMD5
+from rpython.rlib.streamio import open_file_as_stream
+
+from cycy.exceptions import CyCyError
+from cycy.objectfile import Reader, Writer, read_file, read_unit, write_file
+from cycy.objectfile import write_unit
+
+
+CACHE_DIRECTORY = "__cycycache__"
+# Change whenever the opcodes or the format change, to ignore older caches.
+MAGIC = "CYCYC5"
+# How much of an included file to read at once when checking its digest.
+CHUNK_SIZE = 64 * 1024
+
+
+def digest(data):
+    return RMD5(data).hexdigest()
+
+
+def file_digest(path, chunk_size=CHUNK_SIZE):
+    """
+    The digest of the file at the given path, or None if it can't be read.
+
+    The file is read a chunk at a time, rather than all at once.
+
+    """
+
+    try:
+        stream = open_file_as_stream(path)
+    except OSError:
+        return None
+    md5 = RMD5()
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            if not data:
+                break
+            md5.update(data)
+    finally:
+        stream.close()
+    return md5.hexdigest()
+
+
+def cache_path(path, optimized=False):
+    """
+    Where the bytecode compiled from the source at the given path is kept.
+
+    """
+
+    directory, name = _split(path)
+    if name.endswith(".c"):
+        end = len(name) - 2
+        assert end >= 0
+        name = name[:end]
+    if optimized:
+        name += ".opt"
+    return os.path.join(
+        os.path.join(directory, CACHE_DIRECTORY), name + ".cycyc",
+    )
+
+
+def _split(path):
+    """
+    Split a path into its directory and the name within it, like
+    :func:`os.path.split` (which isn't RPython).
+
+    """
+
+    i = path.rfind("/") + 1
+    assert i >= 0
+    return path[:i], path[i:]
+
+
+@attributes([], apply_with_init=False)
+class BytecodeCache(object):
+    """
+    Saves and loads the translation units compiled from sources.
+
+    """
+
+    def load(self, path, source_digest, optimized=False, search_path=""):
+        """
+        Load the cached :class:`cycy.linker.TranslationUnit` for the source
+        with the given digest, if it's still up to date, and was compiled
+        with the same include search path (see
+        :meth:`cycy.parser.core.Parser.search_path`).
+
+        Returns None if there is nothing (valid) in the cache.
+
+        """
+
+        data = read_file(cache_path(path, optimized=optimized))
+        if data is None:
+            return None
+
+        reader = Reader(data)
+        try:
+            if reader.read_str() != MAGIC:
+                return None
+            if reader.read_str() != search_path:
+                return None
+            if reader.read_str() != source_digest:
+                return None
+            for _ in xrange(reader.read_int()):
+                dependency = reader.read_str()
+                included = file_digest(dependency)
+                if included is None or reader.read_str() != included:
+                    return None
+            for _ in xrange(reader.read_int()):
+                if _exists(reader.read_str()):
+                    return None
+            return read_unit(reader)
+        except CyCyError:
+            return None  # including bytecode which fails verification
+
+    def store(
+        self,
+        path,
+        source_digest,
+        dependencies,
+        unit,
+        optimized=False,
+        search_path="",
+        missed=None,
+    ):
+        """
+        Save the translation unit compiled from the source with the given
+        digest, which included the files at the paths in ``dependencies``
+        after finding nothing at those in ``missed``.
+
+        Failing to write the cache (say, because the directory is read
+        only) is not an error, we just recompile next time.
+
+        """
+
+        writer = Writer()
+        writer.write_str(MAGIC)
+        writer.write_str(search_path)
+        writer.write_str(source_digest)
+        writer.write_int(len(dependencies))
+        for dependency in dependencies:
+            included = file_digest(dependency)
+            if included is None:
+                return
+            writer.write_str(dependency)
+            writer.write_str(included)
+        if missed is None:
+            missed = []
+        seen = {}
+        for candidate in missed:
+            seen[candidate] = None
+        writer.write_int(len(seen))
+        for candidate in seen:
+            writer.write_str(candidate)
+        write_unit(writer, unit)
+
+        destination = cache_path(path, optimized=optimized)
+        try:
+            directory, _ = _split(destination)
+            _make_directory(directory)
+            write_file(destination, writer.data())
+        except OSError:
+            pass
+
+
+def _exists(path):
+    try:
+        os.stat(path)
+    except OSError:
+        return False
+    return True
+
+
+def _make_directory(directory):
+    try:
+        os.mkdir(directory)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
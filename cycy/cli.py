@@ -2,7 +2,10 @@
 Usage
 =====
 
-cycy [options] [C_FILE ...]
+cycy [options] [C_FILE | OBJECT_FILE ...]
+
+Runs the program made by linking together the given C files and object
+files (``.cyo``).
 
 
 Options
@@ -15,16 +18,29 @@ Options
 -c PROGRAM       execute the given program, passed in
                  as a string (terminates option list)
 -I, --include    specify an additional include path to search within
+-O               fold constant expressions before compiling, and
+                 optimise the compiled bytecode
+--no-cache       always compile source files, rather than reusing
+                 bytecode cached in __cycycache__ directories
+--compile        compile each C file to an object file alongside it
+                 (file.c to file.cyo), rather than running them
+--stats          once done, show how often included headers were
+                 reused, and how many nodes -O folded
 
 """
 
 import os
 
 from characteristic import Attribute, attributes
-from rpython.rlib.streamio import open_file_as_stream
 
 from cycy import __version__
+from cycy.cache import BytecodeCache
+from cycy.compiler import Compiler
+from cycy.exceptions import CyCyError
+from cycy.include import HEADER_CACHE
 from cycy.interpreter import CyCy
+from cycy.objectfile import object_path, write_object
+from cycy.optimizer import Optimizer
 from cycy.parser import preprocessor
 from cycy.parser.core import IncrementalParser, Parser
 from cycy.repl import REPL
@@ -37,6 +53,7 @@ from cycy.repl import REPL
         Attribute(name="failure"),
         Attribute(name="source_files"),
         Attribute(name="source_string"),
+        Attribute(name="stats"),
     ],
     apply_with_init=False,
 )
@@ -53,6 +70,7 @@ class CommandLine(object):
         failure="",
         source_files=None,
         source_string="",
+        stats=False,
     ):
         if source_files is None:
             source_files = []
@@ -62,12 +80,18 @@ class CommandLine(object):
         self.failure = failure
         self.source_files = source_files
         self.source_string = source_string
+        self.stats = stats
 
 
 def parse_args(args):
     source_string = ""
     source_files = []
     include_paths = []
+    optimizer = None
+    compiler = Compiler()
+    cache = BytecodeCache()
+    action = run_source
+    stats = False
 
     arguments = iter(args)
     for argument in arguments:
@@ -83,6 +107,15 @@ def parse_args(args):
                 return CommandLine(
                     action=print_help, failure="-I expects an argument",
                 )
+        elif argument == "--no-cache":
+            cache = None
+        elif argument == "--compile":
+            action = compile_objects
+        elif argument == "--stats":
+            stats = True
+        elif argument == "-O":
+            optimizer = Optimizer()
+            compiler = Compiler(peephole=True)
         elif argument == "-c":
             source = []  # this is the simplest valid RPython currently
             for argument in arguments:
@@ -102,20 +135,28 @@ def parse_args(args):
             )
 
     cycy = CyCy(
+        compiler=compiler,
         parser=IncrementalParser(
             parser=Parser(
                 preprocessor=preprocessor.with_directories(
                     directories=include_paths,
                 ),
             ),
-        )
+        ),
+        optimizer=optimizer,
+        cache=cache,
     )
+    if action is compile_objects and not source_files:
+        return CommandLine(
+            action=print_help, failure="--compile expects C files",
+        )
     if source_files or source_string:
         return CommandLine(
-            action=run_source,
+            action=action,
             cycy=cycy,
             source_files=source_files,
             source_string=source_string,
+            stats=stats,
         )
     else:
         return CommandLine(action=run_repl, cycy=cycy)
@@ -125,21 +166,56 @@ def run_source(command_line):
     cycy = command_line.cycy
 
     sources = []
+    paths = None
+    objects = None
     source_string = command_line.source_string
     if source_string:
         sources.append(source_string)
     else:
-        for source_path in command_line.source_files:
-            source_file = open_file_as_stream(source_path)
-            sources.append(source_file.readall())
-            source_file.close()
-
-    w_exit_status = cycy.interpret(sources)
+        paths = []
+        objects = []
+        for path in command_line.source_files:
+            if path.endswith(".cyo"):
+                objects.append(path)
+            else:
+                paths.append(path)
+                sources.append(None)  # read as it's lexed
+
+    w_exit_status = cycy.interpret(sources, paths=paths, objects=objects)
+    if command_line.stats:
+        _show_stats(cycy)
     if w_exit_status is None:  # internal error during interpret
         return 1
     return w_exit_status.rint()
 
 
+def compile_objects(command_line):
+    cycy = command_line.cycy
+
+    for path in command_line.source_files:
+        try:
+            unit = cycy.compile(None, path=path)
+        except CyCyError as error:
+            os.write(2, "%s: %s\n" % (path, error.__str__()))
+            return 1
+        if unit is None:
+            os.write(2, "%s: unexpected end of input\n" % (path,))
+            return 1
+        write_object(object_path(path), unit)
+
+        # Each file is a separate translation unit.
+        cycy.compiler = Compiler(peephole=cycy.compiler.peephole)
+    if command_line.stats:
+        _show_stats(cycy)
+    return os.EX_OK
+
+
+def _show_stats(cycy):
+    os.write(2, "%s\n" % (HEADER_CACHE.statistics(),))
+    if cycy.optimizer is not None:
+        os.write(2, "optimizer: folded %d nodes\n" % (cycy.optimizer.folded,))
+
+
 def run_repl(command_line):
     REPL(interpreter=command_line.cycy).run()
     return os.EX_OK
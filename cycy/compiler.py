@@ -1,7 +1,8 @@
 from characteristic import Attribute, attributes
 
-from cycy import bytecode
+from cycy import builtins, bytecode, peephole
 from cycy.exceptions import CyCyError
+from cycy.linker import TranslationUnit
 from cycy.objects import W_Char, W_Function, W_Int32, W_String
 from cycy.parser import ast
 
@@ -32,29 +33,52 @@ class Tape(object):
     """
     A tape carrying the bytecode instructions.
 
+    Each instruction is stored packed into one word, but the tape is
+    indexed as though it were a flat sequence of opcodes each followed by
+    its argument.
+
     """
 
     def __init__(self, instructions=None):
-        self._instructions = instructions or []
+        self._instructions = []
+        if instructions is not None:
+            for i in xrange(0, len(instructions), 2):
+                self.emit(instructions[i], instructions[i + 1])
 
     def __len__(self):
-        return len(self._instructions)
+        return 2 * len(self._instructions)
 
     def __getitem__(self, index):
-        return self._instructions[index]
+        word = self._instructions[index // 2]
+        if index % 2:
+            return bytecode.arg_of(word)
+        return bytecode.opcode_of(word)
 
     def __setitem__(self, index, value):
-        self._instructions[index] = value
+        word = self._instructions[index // 2]
+        if index % 2:
+            word = bytecode.pack(bytecode.opcode_of(word), value)
+        else:
+            word = bytecode.pack(value, bytecode.arg_of(word))
+        self._instructions[index // 2] = word
 
     def emit(self, byte_code, arg=bytecode.NO_ARG):
-        self._instructions.append(byte_code)
-        self._instructions.append(arg)
+        self._instructions.append(bytecode.pack(byte_code, arg))
+
+    def instructions(self):
+        """
+        A copy of the packed instructions, which will never be resized.
+
+        """
+
+        return self._instructions[:]
 
 
 @attributes(
     [
         Attribute(name="constants", exclude_from_repr=True),
         Attribute(name="variables", exclude_from_repr=True),
+        Attribute(name="peephole"),
     ],
     apply_with_init=False,
 )
@@ -72,16 +96,34 @@ class Compiler(object):
 
     .. attribute:: variables
 
-        a mapping between variable names (:class:`str`\ s) and the
-        indices in an array that they should be assigned to
+        the names of the variables (:class:`str`\ s) of the function being
+        compiled, indexed by the slot they are assigned to
+
+    .. attribute:: peephole
+
+        whether to run the peephole optimiser (see :mod:`cycy.peephole`)
+        over each compiled tape
+
+    Literal constants are interned, so each distinct literal occupies a
+    single slot in :attr:`constants` however many times it is used.
 
     """
 
-    def __init__(self):
+    def __init__(self, peephole=False):
+        self.peephole = peephole
         self.constants = []
-        self.variables = {}
+        self._int_constants = {}
+        self._char_constants = {}
+        self._string_constants = {}
+        self.variables = []
         self.functions = {}
 
+        # the arities of functions declared by a prototype, but not defined
+        self._prototypes = {}
+
+        # the innermost block's mapping of variable names to slots is last
+        self._scopes = [{}]
+
     def compile(self, an_ast):
         """
         Compile an AST into bytecode.
@@ -90,25 +132,235 @@ class Compiler(object):
 
         tape = Tape()
         an_ast.compile(tape=tape, compiler=self)
+        return self.bytecode(tape=tape, name="<don't know>", arguments=[])
+
+    def bytecode(self, tape, name, arguments):
+        """
+        Finish compiling a tape into bytecode, optimising it if enabled.
+
+        """
+
+        unoptimized_tape = None
+        if self.peephole:
+            unoptimized_tape = tape
+            tape = Tape(instructions=peephole.optimized(tape))
         return bytecode.Bytecode(
             tape=tape,
-            name="<don't know>",
-            arguments=[],
+            name=name,
+            arguments=arguments,
             constants=self.constants,
             variables=self.variables,
+            unoptimized_tape=unoptimized_tape,
         )
 
     def register_variable(self, name):
-        self.variables[name] = len(self.variables)
-        return len(self.variables) - 1
+        """
+        Declare a variable in the innermost scope, giving it a fresh slot.
+
+        """
+
+        index = len(self.variables)
+        self.variables.append(name)
+        self._scopes[-1][name] = index
+        return index
+
+    def variable_index(self, name):
+        """
+        Find the slot of the innermost variable with the given name.
+
+        Returns -1 if the name isn't declared in any enclosing scope.
+
+        """
+
+        for i in xrange(len(self._scopes) - 1, -1, -1):
+            index = self._scopes[i].get(name, -1)
+            if index != -1:
+                return index
+        return -1
+
+    def enter_scope(self):
+        self._scopes.append({})
+
+    def exit_scope(self):
+        self._scopes.pop()
+
+    def enter_function(self):
+        """
+        Start a new, empty table of variable slots for a function.
+
+        Returns the enclosing table, to be passed back to `exit_function`.
+
+        """
+
+        enclosing = self.variables, self._scopes
+        self.variables = []
+        self._scopes = [{}]
+        return enclosing
+
+    def exit_function(self, enclosing):
+        self.variables, self._scopes = enclosing
 
     def register_constant(self, constant):
+        """
+        Add a constant to the pool, returning its index.
+
+        Integer, character and string literals equal to one already in the
+        pool are given the existing index rather than a new slot.
+
+        """
+
+        if isinstance(constant, W_Int32):
+            return self._intern_int(constant.value, constant)
+        elif isinstance(constant, W_Char):
+            return self._intern_str(
+                self._char_constants, constant.char, constant,
+            )
+        elif isinstance(constant, W_String):
+            return self._intern_str(
+                self._string_constants, constant.value, constant,
+            )
+        return self._append_constant(constant)
+
+    # Separate for ints and strs, since RPython needs each pool (and each
+    # function taking one) to have a single key type.
+    def _intern_int(self, value, constant):
+        pool = self._int_constants
+        index = pool.get(value, -1)
+        if index == -1:
+            index = self._append_constant(constant)
+            pool[value] = index
+        return index
+
+    def _intern_str(self, pool, value, constant):
+        index = pool.get(value, -1)
+        if index == -1:
+            index = self._append_constant(constant)
+            pool[value] = index
+        return index
+
+    def _append_constant(self, constant):
         self.constants.append(constant)
         return len(self.constants) - 1
 
+    def restore(self, constants, functions):
+        """
+        Start from previously compiled constants and functions (see
+        :mod:`cycy.cache`), rather than compiling them anew.
+
+        """
+
+        self.constants = constants
+        self.functions = functions
+        self._prototypes = {}
+
+        self._int_constants = {}
+        self._char_constants = {}
+        self._string_constants = {}
+        for index in xrange(len(constants)):
+            constant = constants[index]
+            if isinstance(constant, W_Int32):
+                self._int_constants[constant.value] = index
+            elif isinstance(constant, W_Char):
+                self._char_constants[constant.char] = index
+            elif isinstance(constant, W_String):
+                self._string_constants[constant.value] = index
+
     def register_function(self, function):
         self.functions[function.name] = self.register_constant(function)
 
+    def declare_function(self, name, arity):
+        """
+        Declare a function which may be defined later, or in another unit.
+
+        """
+
+        self._prototypes[name] = arity
+
+    def define_function(self, name, arity):
+        """
+        Start defining a function, returning it so its bytecode can be set.
+
+        If the function has already been called, the placeholder which
+        those calls refer to becomes the definition.
+
+        """
+
+        index = self.functions.get(name, -1)
+        if index != -1:
+            w_function = self.constants[index]
+            assert isinstance(w_function, W_Function)
+            if w_function.bytecode is None and w_function.arity == arity:
+                return w_function
+
+        w_function = W_Function(name=name, arity=arity, bytecode=None)
+        self.register_function(w_function)
+        return w_function
+
+    def function_index(self, name, arity=-1):
+        """
+        Find the index of the function called by the given name (with the
+        given number of arguments).
+
+        A function which is only declared gets a placeholder without any
+        bytecode, to be replaced when linking (see :mod:`cycy.linker`). So
+        does a builtin (see :mod:`cycy.builtins`) which isn't declared,
+        since a unit or library linked later may still define it.
+
+        """
+
+        index = self.functions.get(name, -1)
+        if index == -1:
+            declared = self._prototypes.get(name, -1)
+            if declared != -1:
+                arity = declared
+            elif arity == -1 or builtins.index_of(name) == -1:
+                raise NoSuchFunction(name)
+            self.register_function(
+                W_Function(name=name, arity=arity, bytecode=None),
+            )
+            index = self.functions[name]
+        return index
+
+    def unit(self):
+        """
+        The translation unit compiled so far.
+
+        """
+
+        return TranslationUnit(
+            constants=self.constants, functions=self.functions,
+        )
+
+
+def compile_branch_if_false(condition, tape, compiler):
+    """
+    Compile a condition followed by a jump taken when it is false.
+
+    Comparisons are fused into the jump, so that their result is never
+    pushed. Returns the offset of the jump, whose target is to be patched.
+
+    """
+
+    if isinstance(condition, ast.BinaryOperation):
+        jump = bytecode.JUMP_IF_NOT_BYTECODE.get(condition.operator, -1)
+        if jump != -1:
+            condition.right.compile(tape=tape, compiler=compiler)
+            condition.left.compile(tape=tape, compiler=compiler)
+            offset = len(tape)
+            tape.emit(jump, 0)
+            return offset
+
+    condition.compile(tape=tape, compiler=compiler)
+    offset = len(tape)
+    tape.emit(bytecode.JUMP_IF_ZERO, 0)
+    return offset
+
+
+class __extend__(ast.Node):
+    # Whether compiling the node leaves a value on the stack, which must be
+    # discarded if it's used as a statement.
+    leaves_value = False
+
 
 class __extend__(ast.Program):
     def compile(self, tape, compiler):
@@ -118,12 +370,16 @@ class __extend__(ast.Program):
 
 class __extend__(ast.Function):
     def compile(self, tape, compiler):
+        if self.prototype:
+            compiler.declare_function(name=self.name, arity=len(self.params))
+            return
+
         # Register the function AOT, to handle cases where it calls itself.
-        function = W_Function(
-            name=self.name, arity=len(self.params), bytecode=None,
+        function = compiler.define_function(
+            name=self.name, arity=len(self.params),
         )
-        compiler.register_function(function)
 
+        enclosing = compiler.enter_function()
         arguments = []
         function_tape = Tape()
         for param in self.params:
@@ -132,23 +388,50 @@ class __extend__(ast.Function):
             param.compile(tape=function_tape, compiler=compiler)
         self.body.compile(tape=function_tape, compiler=compiler)
 
-        function.bytecode = bytecode.Bytecode(
-            tape=function_tape,
-            name="<don't know>",
-            arguments=arguments,
-            constants=compiler.constants,
-            variables=compiler.variables,
+        function.bytecode = compiler.bytecode(
+            tape=function_tape, name=self.name, arguments=arguments,
         )
+        compiler.exit_function(enclosing)
 
 
 class __extend__(ast.Block):
     def compile(self, tape, compiler):
+        compiler.enter_scope()
         for statement in self.statements:
             statement.compile(tape=tape, compiler=compiler)
+            if statement.leaves_value:
+                tape.emit(bytecode.POP)
+        compiler.exit_scope()
 
 
 class __extend__(ast.BinaryOperation):
+    leaves_value = True
+
     def compile(self, tape, compiler):
+        if self.operator == "+" or self.operator == "-":
+            right = self.right
+            if isinstance(right, ast.Int32):
+                # the constant can't have side effects, so needn't go first
+                self.left.compile(tape=tape, compiler=compiler)
+                index = compiler.register_constant(W_Int32(value=right.value))
+                if self.operator == "+":
+                    tape.emit(bytecode.ADD_CONST, index)
+                else:
+                    tape.emit(bytecode.SUB_CONST, index)
+                return
+
+            left = self.left
+            if isinstance(left, ast.Variable):
+                self.right.compile(tape=tape, compiler=compiler)
+                index = compiler.variable_index(left.name)
+                if index == -1:
+                    raise Exception("Attempt to use undeclared variable '%s'" % left.name)
+                if self.operator == "+":
+                    tape.emit(bytecode.ADD_VARIABLE, index)
+                else:
+                    tape.emit(bytecode.SUB_VARIABLE, index)
+                return
+
         # compile RHS then LHS so that their results end up on the stack
         # in reverse order; then we can pop in order in the interpreter
         self.right.compile(tape=tape, compiler=compiler)
@@ -157,6 +440,8 @@ class __extend__(ast.BinaryOperation):
 
 
 class __extend__(ast.Int32):
+    leaves_value = True
+
     def compile(self, tape, compiler):
         wrapped = W_Int32(value=self.value)
         index = compiler.register_constant(wrapped)
@@ -164,6 +449,8 @@ class __extend__(ast.Int32):
 
 
 class __extend__(ast.Char):
+    leaves_value = True
+
     def compile(self, tape, compiler):
         wrapped = W_Char(char=self.value)
         index = compiler.register_constant(wrapped)
@@ -172,14 +459,45 @@ class __extend__(ast.Char):
 
 class __extend__(ast.Assignment):
     def compile(self, tape, compiler):
-        self.right.compile(tape=tape, compiler=compiler)
-        index = compiler.variables.get(self.left.name, -42)
-        if index == -42:
+        index = compiler.variable_index(self.left.name)
+        if index == -1:
             raise Exception("Attempt to use undeclared variable '%s'" % self.left.name)
-        tape.emit(bytecode.STORE_VARIABLE, index)
+
+        step = self._step()
+        if step == 1:
+            tape.emit(bytecode.INC_VARIABLE, index)
+        elif step == -1:
+            tape.emit(bytecode.DEC_VARIABLE, index)
+        else:
+            self.right.compile(tape=tape, compiler=compiler)
+            tape.emit(bytecode.STORE_VARIABLE, index)
+
+    def _step(self):
+        """
+        1 for ``x = x + 1``, -1 for ``x = x - 1``, otherwise 0.
+
+        """
+
+        right = self.right
+        if not isinstance(right, ast.BinaryOperation):
+            return 0
+        variable, constant = right.left, right.right
+        if not isinstance(variable, ast.Variable):
+            return 0
+        if variable.name != self.left.name:
+            return 0
+        if not isinstance(constant, ast.Int32) or constant.value != 1:
+            return 0
+        if right.operator == "+":
+            return 1
+        elif right.operator == "-":
+            return -1
+        return 0
 
 
 class __extend__(ast.String):
+    leaves_value = True
+
     def compile(self, tape, compiler):
         wrapped = W_String(value=self.value)
         index = compiler.register_constant(wrapped)
@@ -196,9 +514,15 @@ class __extend__(ast.ReturnStatement):
 class __extend__(ast.For):
     def compile(self, tape, compiler):
         jump_ix = len(tape)
-        self.condition.compile(tape=tape, compiler=compiler)
-        jump_nz = len(tape)
-        tape.emit(bytecode.JUMP_IF_ZERO, 0)
+        if self.condition is None:
+            # for (;;), or a condition that was folded to always be true
+            self.body.compile(tape=tape, compiler=compiler)
+            tape.emit(bytecode.JUMP, jump_ix)
+            return
+
+        jump_nz = compile_branch_if_false(
+            condition=self.condition, tape=tape, compiler=compiler,
+        )
         self.body.compile(tape=tape, compiler=compiler)
         tape.emit(bytecode.JUMP, jump_ix)
         tape[jump_nz + 1] = len(tape)
@@ -229,15 +553,19 @@ class __extend__(ast.VariableDeclaration):
 
 
 class __extend__(ast.Variable):
+    leaves_value = True
+
     def compile(self, tape, compiler):
-        variable_index = compiler.variables.get(self.name, -42)
-        if variable_index == -42:
+        variable_index = compiler.variable_index(self.name)
+        if variable_index == -1:
             # XXX: this should be either a runtime or compile time exception
             raise Exception("Attempt to use undeclared variable '%s'" % self.name)
         tape.emit(bytecode.LOAD_VARIABLE, variable_index)
 
 
 class __extend__(ast.Call):
+    leaves_value = True
+
     def compile(self, tape, compiler):
         arity = len(self.args)
         assert arity < 256  # technically probably should be smaller?
@@ -248,13 +576,12 @@ class __extend__(ast.Call):
             # working asm blocks
             tape.emit(bytecode.PUTC, bytecode.NO_ARG)
             return
-        index = compiler.functions.get(self.name, -1)
-        if index == -1:
-            raise NoSuchFunction(self.name)
-        tape.emit(bytecode.CALL, index)
+        tape.emit(bytecode.CALL, compiler.function_index(self.name, arity))
 
 
 class __extend__(ast.ArrayDereference):
+    leaves_value = True
+
     def compile(self, tape, compiler):
         self.index.compile(tape=tape, compiler=compiler)
         self.array.compile(tape=tape, compiler=compiler)
@@ -2,9 +2,12 @@ import errno
 import os
 
 from characteristic import Attribute, attributes
-from rpython.rlib.streamio import open_file_as_stream
 
 from cycy.exceptions import CyCyError
+from cycy.parser.lexer import TokenList
+
+
+DEFAULT_HEADER_CACHE_CAPACITY = 128
 
 
 class NotFound(CyCyError):
@@ -19,49 +22,208 @@ class NotFound(CyCyError):
 
 
 @attributes(
-    [Attribute(name="tokens")],
+    [Attribute(name="tokens"), Attribute(name="path")],
     apply_with_init=False,
 )
 class Included(object):
-    def __init__(self, tokens=None):
+    """
+    The tokens (a :class:`cycy.parser.lexer.TokenList`) of an included
+    file, and its path if it was read from disk.
+
+    """
+
+    def __init__(self, tokens=None, path=None):
         if tokens is None:
-            tokens = []
+            tokens = TokenList()
         self.tokens = tokens
+        self.path = path
 
 
 class _Includer(object):
-    pass
+    def search_path(self):
+        """
+        Describe where this includer looks for headers.
 
+        """
 
-@attributes([Attribute(name="path")], apply_with_init=False)
-class DirectoryIncluder(_Includer):
-    def __init__(self, path):
-        self.path = os.path.abspath(os.path.normpath(path))
+        raise NotImplementedError()
+
+    def forget_missing(self):
+        """
+        Forget any headers remembered as missing, which may since exist.
+
+        """
+
+    def candidate(self, name):
+        """
+        The path of the file this includer would include for the given
+        name, or None if it doesn't include files from disk.
+
+        """
+
+        return None
+
+
+class _CachedHeader(object):
+    def __init__(self, included, size, mtime, used):
+        self.included = included
+        self.size = size
+        self.mtime = mtime
+        self.used = used
+
+
+class HeaderCache(object):
+    """
+    Memoises the tokens of headers read from disk, across includes (and
+    across the programs run by one process).
+
+    A header is only lexed again if its size or modification time has
+    changed, and once more than ``capacity`` headers are cached the least
+    recently used is dropped. Paths which didn't exist are remembered as
+    well, so that searching each include directory in turn doesn't keep
+    trying the same missing files, until :meth:`forget_missing` is called
+    (as it is before each source is preprocessed).
+
+    .. attribute:: hits
+
+        how many includes reused cached tokens
+
+    .. attribute:: misses
+
+        how many includes had to read a header (or found it missing)
+
+    .. attribute:: negative_hits
+
+        how many includes were of a path already known to be missing
+
+    """
+
+    def __init__(self, capacity=DEFAULT_HEADER_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self._headers = {}
+        self._missing = {}
+        self._uses = 0
+
+    def include(self, path, name, lexer):
+        """
+        Include the header at the given path, raising :class:`NotFound`
+        (for the given name) if it doesn't exist.
+
+        """
+
+        if path in self._missing:
+            self.negative_hits += 1
+            raise NotFound(path=name)
 
-    def include(self, name, parser):
         try:
-            stream = open_file_as_stream(os.path.join(self.path, name))
+            stat = os.stat(path)
         except OSError as error:
             if error.errno != errno.ENOENT:
                 raise
+            self.misses += 1
+            self._missing[path] = None
             raise NotFound(path=name)
-        else:
-            # TODO: Probably can get lex to not take the whole str
-            return Included(tokens=parser.lexer.lex(stream.readall()))
+
+        self._uses += 1
+        cached = self._headers.get(path, None)
+        if (
+            cached is not None and
+            cached.size == stat.st_size and
+            cached.mtime == stat.st_mtime
+        ):
+            self.hits += 1
+            cached.used = self._uses
+            return cached.included
+
+        self.misses += 1
+        included = Included(tokens=lexer.lex_file(path).compact(), path=path)
+        self._headers[path] = _CachedHeader(
+            included=included,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            used=self._uses,
+        )
+        if len(self._headers) > self.capacity:
+            self._evict()
+        return included
+
+    def _evict(self):
+        oldest = None
+        for path, cached in self._headers.iteritems():
+            if oldest is None or cached.used < self._headers[oldest].used:
+                oldest = path
+        if oldest is not None:
+            del self._headers[oldest]
+
+    def forget_missing(self):
+        self._missing.clear()
+
+    def clear(self):
+        self._headers.clear()
+        self._missing.clear()
+
+    def statistics(self):
+        return "header cache: %d hits, %d misses, %d known missing" % (
+            self.hits, self.misses, self.negative_hits,
+        )
+
+
+HEADER_CACHE = HeaderCache()
 
 
 @attributes(
     [
-        Attribute(name="libraries", exclude_from_repr=True)
+        Attribute(name="path"),
+        Attribute(name="cache", exclude_from_cmp=True, exclude_from_repr=True),
+    ],
+    apply_with_init=False,
+)
+class DirectoryIncluder(_Includer):
+    def __init__(self, path, cache=HEADER_CACHE):
+        self.path = os.path.abspath(os.path.normpath(path))
+        self.cache = cache
+
+    def search_path(self):
+        return self.path
+
+    def include(self, name, parser):
+        return self.cache.include(
+            path=self.candidate(name), name=name, lexer=parser.lexer,
+        )
+
+    def forget_missing(self):
+        self.cache.forget_missing()
+
+    def candidate(self, name):
+        return os.path.join(self.path, name)
+
+
+@attributes(
+    [
+        Attribute(name="libraries", exclude_from_repr=True),
+        Attribute(name="version"),
     ],
     apply_with_init=False,
 )
 class StandardLibraryIncluder(_Includer):
-    def __init__(self, libraries=None):
+    """
+    Includes prebuilt headers, which are identified (for caching) by their
+    version rather than by any path.
+
+    """
+
+    def __init__(self, libraries=None, version=""):
         if libraries is None:
             libraries = {
             }
         self.libraries = libraries
+        self.version = version
+
+    def search_path(self):
+        return "<standard library %s>" % (self.version,)
 
     def include(self, name, parser):
         library = self.libraries.get(name, None)
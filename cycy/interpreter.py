@@ -3,40 +3,256 @@ import os
 from characteristic import Attribute, attributes
 from rpython.rlib import streamio
 
-from cycy import bytecode
+from cycy import builtins, bytecode
+from cycy.cache import digest, file_digest
 from cycy.compiler import Compiler
 from cycy.exceptions import CyCyError
-from cycy.objects import W_Bool, W_Char, W_Int32, W_String
+from cycy.linker import UnresolvedSymbol, link
+from cycy.objectfile import read_object
+from cycy.objects import (
+    W_FALSE, W_NULL, W_TRUE, W_Char, W_Function, W_Int32, W_String,
+)
 from cycy.parser.core import Parser
 from cycy.parser.preprocessor import Preprocessor
+from cycy.stdlib.library import LIBRARY
 
 # So that you can still run this module under standard CPython, I add this
 # import guard that creates a dummy class instead.
 try:
-    from rpython.rlib.jit import JitDriver, purefunction
+    from rpython.rlib.jit import JitDriver, elidable, hint
 except ImportError:
     class JitDriver(object):
         def __init__(self,**kw): pass
         def jit_merge_point(self,**kw): pass
         def can_enter_jit(self,**kw): pass
-    def purefunction(f): return f
+    def elidable(f): return f
+    def hint(x, **kw): return x
 
 
-def get_location(pc, stack, variables):
-    return "%s %s" % (pc, stack, variables)
+def get_printable_location(pc, byte_code):
+    opcode = bytecode.opcode_of(byte_code.instructions[pc >> 1])
+    return "%s:%s %s" % (byte_code.name, pc, bytecode.NAMES[opcode])
 
 
 jitdriver = JitDriver(
-    greens=["pc", "stack", "variables"],
-    reds=["byte_code", "arguments", "interpreter"],
-    get_printable_location=get_location
+    greens=["pc", "byte_code"],
+    reds=["frame", "interpreter"],
+    virtualizables=["frame"],
+    get_printable_location=get_printable_location,
 )
 
 
+DEFAULT_MAX_CALL_DEPTH = 100000
+
+
+@attributes([Attribute(name="depth")], apply_with_init=False)
+class CallDepthExceeded(CyCyError):
+    def __init__(self, depth):
+        self.depth = depth
+
+    def __str__(self):
+        return "Maximum call depth of %s exceeded" % (self.depth,)
+
+
+@elidable
+def _constant(byte_code, index):
+    # Constants are only ever appended to, so reading one is pure.
+    return byte_code.constants[index]
+
+
+class Frame(object):
+    """
+    The operand stack and local variables of a running function.
+
+    Values live in pairs of parallel arrays: a box, or None when the value
+    is a 32-bit integer kept unboxed in the matching int array. Boxes are
+    only created when a value escapes (see :meth:`pop`).
+
+    .. attribute:: caller
+
+        the calling :class:`Frame`, or None for the outermost one
+
+    .. attribute:: depth
+
+        the number of frames (including this one) on the call stack
+
+    .. attribute:: pc
+
+        where to resume this frame's bytecode once its callee returns
+
+    """
+
+    _virtualizable_ = [
+        "stack[*]",
+        "int_stack[*]",
+        "sp",
+        "variables[*]",
+        "int_variables[*]",
+    ]
+
+    def __init__(self, byte_code, caller=None):
+        self = hint(self, access_directly=True, fresh_virtualizable=True)
+
+        self.byte_code = byte_code
+        self.caller = caller
+        self.depth = 1 if caller is None else caller.depth + 1
+        self.pc = 0
+
+        self.stack = [None] * byte_code.stack_size
+        self.int_stack = [0] * byte_code.stack_size
+        self.sp = 0
+
+        self.variables = [None] * len(byte_code.variables)
+        self.int_variables = [0] * len(byte_code.variables)
+
+    def push(self, w_value):
+        sp = self.sp
+        assert sp >= 0
+        if isinstance(w_value, W_Int32):
+            self.stack[sp] = None
+            self.int_stack[sp] = w_value.value
+        else:
+            self.stack[sp] = w_value
+        self.sp = sp + 1
+
+    def push_int(self, value):
+        sp = self.sp
+        assert sp >= 0
+        self.stack[sp] = None
+        self.int_stack[sp] = value
+        self.sp = sp + 1
+
+    def dup(self):
+        sp = self.sp
+        i = sp - 1
+        assert i >= 0
+        self.stack[sp] = self.stack[i]
+        self.int_stack[sp] = self.int_stack[i]
+        self.sp = sp + 1
+
+    def drop(self):
+        """
+        Pop a value, discarding it.
+
+        """
+
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+
+    def pop(self):
+        """
+        Pop a boxed value.
+
+        """
+
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        w_value = self.stack[sp]
+        if w_value is None:
+            return W_Int32(self.int_stack[sp])
+        return w_value
+
+    def pop_int(self):
+        """
+        Pop the integer value of a value, without boxing it.
+
+        """
+
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        w_value = self.stack[sp]
+        if w_value is None:
+            return self.int_stack[sp]
+        return w_value.rint()
+
+    def pop_is_true(self):
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        w_value = self.stack[sp]
+        if w_value is None:
+            return self.int_stack[sp] != 0
+        return w_value.is_true()
+
+    def set_variable(self, index, w_value):
+        assert index >= 0
+        if isinstance(w_value, W_Int32):
+            self.variables[index] = None
+            self.int_variables[index] = w_value.value
+        else:
+            self.variables[index] = w_value
+
+    def load_variable(self, index):
+        assert index >= 0
+        sp = self.sp
+        assert sp >= 0
+        self.stack[sp] = self.variables[index]
+        self.int_stack[sp] = self.int_variables[index]
+        self.sp = sp + 1
+
+    def variable_int(self, index):
+        """
+        The integer value of a variable, without boxing it.
+
+        """
+
+        assert index >= 0
+        w_value = self.variables[index]
+        if w_value is None:
+            return self.int_variables[index]
+        return w_value.rint()
+
+    def add_to_variable(self, index, value):
+        assert index >= 0
+        result = self.variable_int(index) + value
+        self.variables[index] = None
+        self.int_variables[index] = result
+
+    def pass_argument(self, callee, index):
+        """
+        Pop a value into one of the callee's variables, without boxing it.
+
+        """
+
+        assert index >= 0
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        callee.variables[index] = self.stack[sp]
+        callee.int_variables[index] = self.int_stack[sp]
+
+    def return_to(self, caller):
+        """
+        Pop a value onto the caller's stack, without boxing it.
+
+        """
+
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        caller_sp = caller.sp
+        assert caller_sp >= 0
+        caller.stack[caller_sp] = self.stack[sp]
+        caller.int_stack[caller_sp] = self.int_stack[sp]
+        caller.sp = caller_sp + 1
+
+    def store_variable(self, index):
+        assert index >= 0
+        sp = self.sp - 1
+        assert sp >= 0
+        self.sp = sp
+        self.variables[index] = self.stack[sp]
+        self.int_variables[index] = self.int_stack[sp]
+
+
 @attributes(
     [
         Attribute(name="compiler"),
         Attribute(name="parser"),
+        Attribute(name="optimizer"),
         Attribute(name="functions", exclude_from_repr=True),
     ],
     apply_with_init=False,
@@ -45,17 +261,30 @@ class CyCy(object):
     """
     The main CyCy interpreter.
 
+    .. attribute:: optimizer
+
+        an optional :class:`cycy.optimizer.Optimizer` which is run over
+        each program between parsing and compiling it
+
+    .. attribute:: cache
+
+        an optional :class:`cycy.cache.BytecodeCache` used for sources
+        interpreted from files
+
     """
 
     def __init__(
         self,
         compiler=None,
         parser=None,
+        optimizer=None,
         functions=None,
         stdin=None,
         stdout=None,
         stderr=None,
         handle_error=None,
+        max_call_depth=DEFAULT_MAX_CALL_DEPTH,
+        cache=None,
     ):
         if compiler is None:
             compiler = Compiler()
@@ -67,99 +296,69 @@ class CyCy(object):
             handle_error = self._show_traceback
 
         self._handle_error = handle_error
+        self.max_call_depth = max_call_depth
+        self.cache = cache
         self.compiler = compiler
         self.parser = parser
+        self.optimizer = optimizer
         self.functions = functions
 
         # NOTE: This uses streamio, which by its own admission "isn't
         #       ready for general usage"
         self.stdin = stdin if stdin is not None else _open(fd=0)
-        self.stdout = stdout if stdout is not None else _open(fd=1)
+        self.stdout = stdout if stdout is not None else _open_output(fd=1)
         self.stderr = stderr if stderr is not None else _open(fd=2)
 
     def run(self, byte_code, arguments=[]):
+        """
+        Run the given bytecode to completion, returning its return value.
+
+        Calls made by the bytecode push a new :class:`Frame` and continue
+        within this loop, rather than recursing.
+
+        """
+
         pc = 0
-        stack = []
-        variables = [None] * len(byte_code.variables)
+        frame = Frame(byte_code=byte_code)
 
+        # The arguments occupy the first slots, in order.
         assert len(byte_code.arguments) == len(arguments)
-        for i in xrange(len(byte_code.arguments)):
-            name = byte_code.arguments[i]
-            index = byte_code.variables[name]
-            variables[index] = arguments[i]
+        for i in xrange(len(arguments)):
+            frame.set_variable(i, arguments[i])
 
-        while pc < len(byte_code.tape):
+        while (pc >> 1) < len(byte_code.instructions):
             jitdriver.jit_merge_point(
                 pc=pc,
-                stack=stack,
-                variables=variables,
                 byte_code=byte_code,
-                arguments=arguments,
+                frame=frame,
                 interpreter=self,
             )
 
-            opcode = byte_code.tape[pc]
-            arg = byte_code.tape[pc + 1]
+            word = byte_code.instructions[pc >> 1]
+            opcode = bytecode.opcode_of(word)
+            arg = bytecode.arg_of(word)
             pc += 2
 
-            if opcode == bytecode.LOAD_CONST:
-                value = byte_code.constants[arg]
-                stack.append(value)
-            elif opcode == bytecode.BINARY_NEQ:
-                left = stack.pop()
-                right = stack.pop()
-                assert isinstance(left, W_Int32) or isinstance(left, W_Char)
-                assert isinstance(right, W_Int32)
-                stack.append(W_Bool(left.neq(right)))
-            elif opcode == bytecode.PUTC:
-                value = stack.pop()
-                assert isinstance(value, W_Char)
-                os.write(1, value.char)
-                # TODO: error handling?
-            elif opcode == bytecode.BINARY_LEQ:
-                left = stack.pop()
-                right = stack.pop()
-                assert isinstance(left, W_Int32)
-                assert isinstance(right, W_Int32)
-                stack.append(W_Bool(left.leq(right)))
-            elif opcode == bytecode.CALL:
-                w_func = byte_code.constants[arg]
-
-                args = []
-                for _ in xrange(w_func.arity):
-                    args.append(stack.pop())
-
-                return_value = w_func.call(arguments=args, interpreter=self)
-                if return_value is not None:
-                    stack.append(return_value)
-            elif opcode == bytecode.RETURN:
-                if arg == 1:
-                    return stack.pop()
-                else:
-                    return None
-            elif opcode == bytecode.STORE_VARIABLE:
-                val = stack.pop()
-                variables[arg] = val
-            elif opcode == bytecode.LOAD_VARIABLE:
-                stack.append(variables[arg])
-            elif opcode == bytecode.BINARY_ADD:
-                left = stack.pop()
-                right = stack.pop()
-                assert isinstance(left, W_Int32)
-                assert isinstance(right, W_Int32)
-                stack.append(W_Int32(left.add(right)))
-            elif opcode == bytecode.BINARY_SUB:
-                left = stack.pop()
-                right = stack.pop()
-                assert isinstance(left, W_Int32)
-                assert isinstance(right, W_Int32)
-                stack.append(W_Int32(left.sub(right)))
-            elif opcode == bytecode.DEREFERENCE:
-                array = stack.pop()
-                index = stack.pop()
-                assert isinstance(array, W_String)
-                assert isinstance(index, W_Int32)
-                stack.append(W_Char(array.dereference(index)))
+            # The branches are ordered by how often each opcode runs in the
+            # benchmarks, most often first, as counted by
+            # benchmarks/opcode_profile.py (with or without -O, which gives
+            # the same order), so that untranslated the common cases are
+            # found quickly. Opcodes the benchmarks never run come last.
+            # Rerun it and reorder when adding opcodes or benchmarks. Once
+            # translated, RPython turns this chain into a single switch,
+            # provided every branch stays a plain comparison of opcode
+            # against a constant.
+            if opcode == bytecode.LOAD_VARIABLE:
+                frame.load_variable(arg)
+            elif opcode == bytecode.LOAD_CONST:
+                frame.push(_constant(byte_code, arg))
+            elif opcode == bytecode.INC_VARIABLE:
+                frame.add_to_variable(arg, 1)
+            elif opcode == bytecode.JUMP_IF_NOT_LEQ:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                if not left <= right:
+                    pc = arg
             elif opcode == bytecode.JUMP:
                 old_pc = pc
                 pc = arg
@@ -168,45 +367,254 @@ class CyCy(object):
                     # so we can probably enter the jit
                     jitdriver.can_enter_jit(
                         pc=pc,
-                        stack=stack,
-                        variables=variables,
                         byte_code=byte_code,
-                        arguments=arguments,
+                        frame=frame,
                         interpreter=self,
                     )
-            elif opcode == bytecode.JUMP_IF_NOT_ZERO:
-                val = stack.pop()
-                if val.is_true():
+            elif opcode == bytecode.DEREFERENCE:
+                array = frame.pop()
+                index = frame.pop_int()
+                assert isinstance(array, W_String)
+                frame.push(W_Char(array.dereference(index)))
+            elif opcode == bytecode.RETURN:
+                caller = frame.caller
+                if caller is None:
+                    if arg == 1:
+                        return frame.pop()
+                    else:
+                        return None
+
+                if arg == 1:
+                    frame.return_to(caller)
+                else:
+                    caller.push(W_NULL)
+                frame = caller
+                byte_code = caller.byte_code
+                pc = caller.pc
+            elif opcode == bytecode.CALL:
+                w_func = _constant(byte_code, arg)
+                assert isinstance(w_func, W_Function)
+
+                if frame.depth >= self.max_call_depth:
+                    raise CallDepthExceeded(depth=self.max_call_depth)
+                callee = Frame(byte_code=w_func.bytecode, caller=frame)
+                for i in xrange(w_func.arity):
+                    frame.pass_argument(callee, i)
+
+                frame.pc = pc
+                frame = callee
+                byte_code = callee.byte_code
+                pc = 0
+            elif opcode == bytecode.SUB_CONST:
+                left = frame.pop_int()
+                right = _constant(byte_code, arg).rint()
+                frame.push_int(left - right)
+            elif opcode == bytecode.JUMP_IF_EQ:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                if left == right:
                     pc = arg
+            elif opcode == bytecode.POP:
+                frame.drop()
+            elif opcode == bytecode.PUTC:
+                value = frame.pop()
+                assert isinstance(value, W_Char)
+                self.stdout.write(value.char)
+                frame.push(value)
+            elif opcode == bytecode.BINARY_ADD:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                frame.push_int(left + right)
+            elif opcode == bytecode.STORE_VARIABLE:
+                frame.store_variable(arg)
+            elif opcode == bytecode.ADD_VARIABLE:
+                right = frame.pop_int()
+                frame.push_int(frame.variable_int(arg) + right)
+            elif opcode == bytecode.CALL_BUILTIN:
+                builtin = builtins.BUILTINS[arg]
+                arguments = [frame.pop() for _ in xrange(builtin.arity)]
+                frame.push(builtin.call(interpreter=self, arguments=arguments))
+            elif opcode == bytecode.ADD_CONST:
+                left = frame.pop_int()
+                right = _constant(byte_code, arg).rint()
+                frame.push_int(left + right)
             elif opcode == bytecode.JUMP_IF_ZERO:
-                val = stack.pop()
-                if not val.is_true():
+                if not frame.pop_is_true():
                     pc = arg
-
+            elif opcode == bytecode.DEC_VARIABLE:
+                frame.add_to_variable(arg, -1)
+            elif opcode == bytecode.JUMP_IF_NOT_ZERO:
+                if frame.pop_is_true():
+                    pc = arg
+            elif opcode == bytecode.BINARY_SUB:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                frame.push_int(left - right)
+            elif opcode == bytecode.SUB_VARIABLE:
+                right = frame.pop_int()
+                frame.push_int(frame.variable_int(arg) - right)
+            elif opcode == bytecode.BINARY_LEQ:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                frame.push(W_TRUE if left <= right else W_FALSE)
+            elif opcode == bytecode.BINARY_NEQ:
+                left = frame.pop_int()
+                right = frame.pop_int()
+                frame.push(W_TRUE if left != right else W_FALSE)
+            elif opcode == bytecode.DUP:
+                frame.dup()
         assert False, "bytecode exited the main loop without returning"
 
-    def interpret(self, sources):
-        for source in sources:
-            try:
-                program = self.parser.parse(source=source)
-                if program is None:
-                    return
-                self.compiler.compile(program)
-            except CyCyError as error:
-                if self._handle_error(error) is None:
+    def interpret(self, sources, paths=None, objects=None):
+        """
+        Compile each source, link them, and run the result's ``main``,
+        returning its exit status.
+
+        Each source is a separate translation unit, which can call the
+        functions defined in the others (or in the object files at the
+        given paths) by declaring them. If given, paths are the files each
+        source was read from, whose compiled bytecode can be cached. A
+        source which is None is read from its file as it's lexed.
+
+        """
+
+        # Headers missing from a directory are looked for there again by
+        # each program, but not by each of its sources.
+        self.parser.forget_missing()
+        try:
+            units = []
+            for i in xrange(len(sources)):
+                path = None
+                if paths is not None:
+                    path = paths[i]
+
+                compiler = self.compiler
+                if i > 0:
+                    compiler = Compiler(peephole=self.compiler.peephole)
+                unit = self.compile(sources[i], path=path, compiler=compiler)
+                if unit is None:
                     return
-                raise
+                units.append(unit)
+
+            if objects is not None:
+                for path in objects:
+                    units.append(read_object(path))
+
+            w_main = link(units, libraries=LIBRARY).get("main", None)
+            if w_main is None:
+                raise UnresolvedSymbol(name="main")
+        except CyCyError as error:
+            if self._handle_error(error) is None:
+                return
+            raise
+
+        try:
+            try:
+                return_value = w_main.call(arguments=[], interpreter=self)
+            finally:
+                self.flush()
+        except CyCyError as error:
+            if self._handle_error(error) is None:
+                return
+            raise
+        assert isinstance(return_value, W_Int32)
+        return return_value
+
+    def compile(self, source, path=None, compiler=None):
+        """
+        Compile a source into a :class:`cycy.linker.TranslationUnit`.
+
+        If the source is None, it's read from the file at the given path,
+        a chunk at a time (rather than all at once).
+
+        Returns None if the source is incomplete.
+
+        """
+
+        if compiler is None:
+            compiler = self.compiler
 
-            w_main = self.compiler.constants[self.compiler.functions["main"]]
-            return_value = w_main.call(arguments=[], interpreter=self)
-            assert isinstance(return_value, W_Int32)
-            return return_value
+        if source is None:
+            source_digest = file_digest(path)
+        else:
+            source_digest = digest(source)
+
+        # Cached bytecode replaces the compiler's, so can only be used
+        # before anything else has been compiled.
+        caching = (
+            self.cache is not None and
+            path is not None and
+            source_digest is not None and
+            not compiler.functions
+        )
+        if caching and self._load_cached(path, source_digest, compiler):
+            return compiler.unit()
+
+        if source is None:
+            program = self.parser.parse_file(path=path)
+        else:
+            program = self.parser.parse(source=source)
+        if program is None:
+            return None
+        if self.optimizer is not None:
+            program = self.optimizer.optimize(program)
+        compiler.compile(program)
+        if caching:
+            self._store_cached(path, source_digest, compiler)
+        return compiler.unit()
+
+    def _optimized(self):
+        return self.optimizer is not None or self.compiler.peephole
+
+    def _load_cached(self, path, source_digest, compiler):
+        unit = self.cache.load(
+            path=path,
+            source_digest=source_digest,
+            optimized=self._optimized(),
+            search_path=self.parser.search_path(),
+        )
+        if unit is None:
+            return False
+        compiler.restore(constants=unit.constants, functions=unit.functions)
+        return True
+
+    def _store_cached(self, path, source_digest, compiler):
+        self.cache.store(
+            path=path,
+            source_digest=source_digest,
+            dependencies=self.parser.dependencies,
+            missed=self.parser.missed,
+            unit=compiler.unit(),
+            optimized=self._optimized(),
+            search_path=self.parser.search_path(),
+        )
+
+    def flush(self):
+        """
+        Flush any output the running program has buffered.
+
+        """
+
+        self.stdout.flush()
 
     def _show_traceback(self, error):
         self.stdout.write(error.rstr())
         self.stdout.write("\n")
+        self.flush()
 
 
 def _open(fd):
     base = streamio.DiskFile(fd)
     return streamio.BufferingInputStream(base)
+
+
+def _open_output(fd):
+    """
+    Open a buffered output stream, which is line buffered if it's a tty.
+
+    """
+
+    base = streamio.DiskFile(fd)
+    if os.isatty(fd):
+        return streamio.LineBufferingOutputStream(base)
+    return streamio.BufferingOutputStream(base)
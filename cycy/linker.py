@@ -0,0 +1,162 @@
+"""
+Link separately compiled translation units into a single program.
+
+Each translation unit is compiled with its own
+:class:`cycy.compiler.Compiler`, and so indexes into its own pool of
+constants. A call to a function which the unit only declares compiles to a
+``CALL`` of a placeholder :class:`cycy.objects.W_Function` which has no
+bytecode. Linking replaces each placeholder with the function of the same
+name defined by some unit, so that calls between units need no lookup at
+run time. Calls to functions which no unit defines are instead made native
+calls to the builtin of that name (see :mod:`cycy.builtins`), if there is
+one, and otherwise are resolved from the libraries.
+
+"""
+
+from characteristic import Attribute, attributes
+
+from cycy import builtins
+from cycy.exceptions import CyCyError
+from cycy.objects import W_Function
+
+
+@attributes([Attribute(name="name")], apply_with_init=False)
+class UnresolvedSymbol(CyCyError):
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return "undefined reference to '%s'" % (self.name,)
+
+
+@attributes([Attribute(name="name")], apply_with_init=False)
+class DuplicateSymbol(CyCyError):
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return "multiple definition of '%s'" % (self.name,)
+
+
+@attributes([Attribute(name="name")], apply_with_init=False)
+class ConflictingDeclaration(CyCyError):
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return "conflicting types for '%s'" % (self.name,)
+
+
+@attributes(
+    [
+        Attribute(name="constants", exclude_from_repr=True),
+        Attribute(name="functions"),
+    ],
+    apply_with_init=False,
+)
+class TranslationUnit(object):
+    """
+    The constants and functions compiled from a single source.
+
+    .. attribute:: constants
+
+        the pool of constants which the unit's bytecode indexes into
+
+    .. attribute:: functions
+
+        a :class:`dict` mapping the name of each function the unit defines
+        or calls to its index in :attr:`constants`
+
+    """
+
+    def __init__(self, constants, functions):
+        self.constants = constants
+        self.functions = functions
+
+    def undefined(self):
+        """
+        The names of the functions called but not defined by this unit.
+
+        """
+
+        return [
+            name for name, index in self.functions.iteritems()
+            if _function(self, index).bytecode is None
+        ]
+
+
+def link(units, libraries=None):
+    """
+    Resolve the calls between translation units.
+
+    Calls to functions which no unit defines are made calls to the
+    builtin of that name, if there is one, and failing that are resolved
+    from the (already linked) units of the given libraries, if any. A
+    builtin thereby replaces the library's (slower) bytecode version of
+    the same function. Unlike the units themselves, a unit may define a
+    function that a builtin (or a library) does.
+
+    Returns a :class:`dict` mapping the name of every function defined by
+    the units to the function.
+
+    """
+
+    archive = {}
+    if libraries is not None:
+        for library in libraries:
+            for name, index in library.functions.iteritems():
+                w_function = _function(library, index)
+                if w_function.bytecode is not None:
+                    archive[name] = w_function
+
+    symbols = {}
+    for unit in units:
+        for name, index in unit.functions.iteritems():
+            w_function = _function(unit, index)
+            if w_function.bytecode is None:
+                continue
+            if symbols.get(name, w_function) is not w_function:
+                raise DuplicateSymbol(name=name)
+            symbols[name] = w_function
+
+    for unit in units:
+        for name, index in unit.functions.iteritems():
+            w_function = _function(unit, index)
+            if w_function.bytecode is not None:
+                continue
+            definition = symbols.get(name, None)
+            if definition is None and builtins.index_of(name) != -1:
+                _call_builtin(unit, name=name, index=index)
+                continue
+            if definition is None:
+                definition = archive.get(name, None)
+            if definition is None:
+                raise UnresolvedSymbol(name=name)
+            if definition.arity != w_function.arity:
+                raise ConflictingDeclaration(name=name)
+            unit.constants[index] = definition
+    return symbols
+
+
+def _call_builtin(unit, name, index):
+    """
+    Make the unit's calls to the function at the given index (which is
+    undefined) native calls to the builtin with the same name.
+
+    """
+
+    builtin = builtins.index_of(name)
+    if builtins.BUILTINS[builtin].arity != _function(unit, index).arity:
+        raise ConflictingDeclaration(name=name)
+    for w_constant in unit.constants:
+        if (
+            isinstance(w_constant, W_Function) and
+            w_constant.bytecode is not None
+        ):
+            w_constant.bytecode.call_builtin(index=index, builtin=builtin)
+
+
+def _function(unit, index):
+    w_function = unit.constants[index]
+    assert isinstance(w_function, W_Function)
+    return w_function
@@ -0,0 +1,258 @@
+"""
+The on-disk format of compiled translation units.
+
+It is shared by object files (``prog.cyo``, written by ``cycy --compile``)
+and by the bytecode cache (see :mod:`cycy.cache`). Integers are written as
+``<digits>;`` and strings as ``<length>:<bytes>``.
+
+"""
+
+import os
+
+from characteristic import Attribute, attributes
+from rpython.rlib.streamio import open_file_as_stream
+
+from cycy.bytecode import Bytecode, arg_of, opcode_of
+from cycy.compiler import Tape
+from cycy.exceptions import CyCyError
+from cycy.linker import TranslationUnit
+from cycy.objects import W_Char, W_Function, W_Int32, W_String
+
+
+# Change whenever the opcodes or the format change, to reject older objects.
+OBJECT_MAGIC = "CYCYO2"
+
+_INT, _CHAR, _STRING, _FUNCTION, _EXTERN = 0, 1, 2, 3, 4
+
+
+class Corrupt(CyCyError):
+    def __str__(self):
+        return "Corrupt compiled bytecode"
+
+
+@attributes([Attribute(name="path")], apply_with_init=False)
+class InvalidObjectFile(CyCyError):
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return "%s is not a valid object file" % (self.path,)
+
+
+def object_path(path):
+    """
+    Where ``cycy --compile`` puts the object compiled from the given path.
+
+    """
+
+    if path.endswith(".c"):
+        end = len(path) - 2
+        assert end >= 0
+        path = path[:end]
+    return path + ".cyo"
+
+
+def write_object(path, unit):
+    writer = Writer()
+    writer.write_str(OBJECT_MAGIC)
+    write_unit(writer, unit)
+    write_file(path, writer.data())
+
+
+def read_object(path):
+    data = read_file(path)
+    if data is None:
+        raise InvalidObjectFile(path=path)
+
+    reader = Reader(data)
+    try:
+        if reader.read_str() != OBJECT_MAGIC:
+            raise InvalidObjectFile(path=path)
+        return read_unit(reader)
+    except CyCyError:
+        # including bytecode which fails verification
+        raise InvalidObjectFile(path=path)
+
+
+def write_unit(writer, unit):
+    writer.write_int(len(unit.constants))
+    for w_constant in unit.constants:
+        if isinstance(w_constant, W_Int32):
+            writer.write_int(_INT)
+            writer.write_int(w_constant.value)
+        elif isinstance(w_constant, W_Char):
+            writer.write_int(_CHAR)
+            writer.write_str(w_constant.char)
+        elif isinstance(w_constant, W_String):
+            writer.write_int(_STRING)
+            writer.write_str(w_constant.value)
+        else:
+            assert isinstance(w_constant, W_Function)
+            byte_code = w_constant.bytecode
+            if byte_code is None:
+                writer.write_int(_EXTERN)
+                writer.write_str(w_constant.name)
+                writer.write_int(w_constant.arity)
+                continue
+            writer.write_int(_FUNCTION)
+            writer.write_str(w_constant.name)
+            writer.write_int(w_constant.arity)
+            # (copies, since one is resized and the other isn't, and RPython
+            # wants a single kind of list passed to write_strs)
+            writer.write_strs(list(byte_code.arguments))
+            writer.write_strs(list(byte_code.variables))
+            writer.write_int(len(byte_code.instructions))
+            for word in byte_code.instructions:
+                writer.write_int(word)
+
+    writer.write_int(len(unit.functions))
+    for name, index in unit.functions.iteritems():
+        writer.write_str(name)
+        writer.write_int(index)
+
+
+def read_unit(reader):
+    constants = []
+    compiled = []
+
+    for _ in xrange(reader.read_int()):
+        kind = reader.read_int()
+        if kind == _INT:
+            constants.append(W_Int32(reader.read_int()))
+        elif kind == _CHAR:
+            char = reader.read_str()
+            if len(char) != 1:
+                raise Corrupt()
+            constants.append(W_Char(char))
+        elif kind == _STRING:
+            constants.append(W_String(reader.read_str()))
+        elif kind == _EXTERN:
+            constants.append(
+                W_Function(
+                    name=reader.read_str(),
+                    arity=reader.read_int(),
+                    bytecode=None,
+                ),
+            )
+        elif kind == _FUNCTION:
+            w_function = W_Function(
+                name=reader.read_str(),
+                arity=reader.read_int(),
+                bytecode=None,
+            )
+            # (separate copies, so that RPython doesn't unify how they're
+            # used by Bytecode)
+            arguments = list(reader.read_strs())
+            variables = list(reader.read_strs())
+            instructions = []
+            for _ in xrange(reader.read_int()):
+                word = reader.read_int()
+                instructions.append(opcode_of(word))
+                instructions.append(arg_of(word))
+            compiled.append((w_function, arguments, variables, instructions))
+            constants.append(w_function)
+        else:
+            raise Corrupt()
+
+    # Only once every function exists can calls between them be verified.
+    for w_function, arguments, variables, instructions in compiled:
+        w_function.bytecode = Bytecode(
+            tape=Tape(instructions=instructions),
+            name=w_function.name,
+            arguments=arguments,
+            constants=constants,
+            variables=variables,
+        )
+
+    functions = {}
+    for _ in xrange(reader.read_int()):
+        name = reader.read_str()
+        index = reader.read_int()
+        if not 0 <= index < len(constants):
+            raise Corrupt()
+        if not isinstance(constants[index], W_Function):
+            raise Corrupt()
+        functions[name] = index
+    return TranslationUnit(constants=constants, functions=functions)
+
+
+class Writer(object):
+    def __init__(self):
+        self._chunks = []
+
+    def write_int(self, value):
+        self._chunks.append("%d;" % (value,))
+
+    def write_str(self, value):
+        self._chunks.append("%d:" % (len(value),))
+        self._chunks.append(value)
+
+    def write_strs(self, values):
+        self.write_int(len(values))
+        for value in values:
+            self.write_str(value)
+
+    def data(self):
+        return "".join(self._chunks)
+
+
+class Reader(object):
+    def __init__(self, data):
+        self._data = data
+        self._position = 0
+
+    def _read_until(self, terminator):
+        start = self._position
+        assert start >= 0
+        end = self._data.find(terminator, start)
+        if end < 0:
+            raise Corrupt()
+        assert end >= start
+        self._position = end + 1
+        try:
+            return int(self._data[start:end])
+        except ValueError:
+            raise Corrupt()
+
+    def read_int(self):
+        return self._read_until(";")
+
+    def read_str(self):
+        length = self._read_until(":")
+        start = self._position
+        end = start + length
+        if length < 0 or end > len(self._data):
+            raise Corrupt()
+        assert end >= start >= 0
+        self._position = end
+        return self._data[start:end]
+
+    def read_strs(self):
+        return [self.read_str() for _ in xrange(self.read_int())]
+
+
+def read_file(path):
+    """
+    The contents of the file at the given path, or None if it can't be read.
+
+    """
+
+    try:
+        stream = open_file_as_stream(path)
+    except OSError:
+        return None
+    try:
+        return stream.readall()
+    finally:
+        stream.close()
+
+
+def write_file(path, data):
+    # Write then rename, so a concurrent run never sees half a file.
+    partial = path + ".tmp"
+    stream = open_file_as_stream(partial, "w")
+    try:
+        stream.write(data)
+    finally:
+        stream.close()
+    os.rename(partial, path)
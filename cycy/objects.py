@@ -37,6 +37,9 @@ class W_Char(W_Object):
     def dump(self):
         return "(char)'%s'" % self.char
 
+    def rint(self):
+        return ord(self.char[0])
+
 
 @attributes([Attribute(name="value")], apply_with_init=False)
 class W_String(W_Object):
@@ -45,11 +48,10 @@ class W_String(W_Object):
         self.value = value
 
     def dereference(self, index):
-        assert isinstance(index, W_Int32)
-        rint = index.rint()
-        if len(self.value) == rint:
+        assert isinstance(index, int)
+        if len(self.value) == index:
             return "\0"
-        return self.value[rint]
+        return self.value[index]
 
     def dump(self):
         return '(char *)"%s"' % self.value
@@ -98,6 +100,13 @@ class W_Bool(W_Object):
     def dump(self):
         return "(bool)%s" % str(self.value).lower()
 
+    def rint(self):
+        return int(self.value)
+
+
+W_TRUE = W_Bool(True)
+W_FALSE = W_Bool(False)
+
 
 @attributes(
     [
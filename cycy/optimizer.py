@@ -0,0 +1,197 @@
+"""
+An optimisation pass over the AST, run between parsing and compiling.
+
+"""
+
+from characteristic import attributes
+
+from cycy.parser import ast
+
+
+# The operators the interpreter has opcodes for, and so which we can fold
+# exactly as they would have been evaluated at runtime.
+FOLDABLE_OPERATORS = ["!=", "<=", "+", "-"]
+
+
+@attributes([], apply_with_init=False)
+class Optimizer(object):
+    """
+    Folds constant expressions and simplifies identities in an AST.
+
+    .. attribute:: folded
+
+        the number of nodes folded away so far (see ``cycy --stats``)
+
+    """
+
+    def __init__(self):
+        self.folded = 0
+
+    def optimize(self, program):
+        """
+        Optimise a program, returning the (possibly new) AST.
+
+        """
+
+        return program.optimize(optimizer=self)
+
+    def replaced(self, node):
+        """
+        Record that a node was folded into the given replacement.
+
+        """
+
+        self.folded += 1
+        return node
+
+
+def _is_constant(node):
+    return isinstance(node, ast.Int32) or isinstance(node, ast.Char)
+
+
+def _constant_value(node):
+    """
+    The integer value of a constant node.
+
+    """
+
+    if isinstance(node, ast.Char):
+        return ord(node.value[0])
+    assert isinstance(node, ast.Int32)
+    return node.value
+
+
+def _is_zero(node):
+    return _is_constant(node) and _constant_value(node) == 0
+
+
+def _is_int_valued(node):
+    # Operands which evaluate to the same value with or without an
+    # integer operation applied to them.
+    if isinstance(node, ast.Variable):
+        return True
+    elif isinstance(node, ast.BinaryOperation):
+        return node.operator == "+" or node.operator == "-"
+    return False
+
+
+class __extend__(ast.Node):
+    def optimize(self, optimizer):
+        return self
+
+
+class __extend__(ast.Program):
+    def optimize(self, optimizer):
+        self.units = [unit.optimize(optimizer=optimizer) for unit in self.units]
+        return self
+
+
+class __extend__(ast.Function):
+    def optimize(self, optimizer):
+        if self.body is not None:
+            self.body = self.body.optimize(optimizer=optimizer)
+        return self
+
+
+class __extend__(ast.Block):
+    def optimize(self, optimizer):
+        statements = []
+        for statement in self.statements:
+            optimized = statement.optimize(optimizer=optimizer)
+            if optimized is not None:
+                statements.append(optimized)
+        self.statements = statements
+        return self
+
+
+class __extend__(ast.BinaryOperation):
+    def optimize(self, optimizer):
+        self.left = self.left.optimize(optimizer=optimizer)
+        self.right = self.right.optimize(optimizer=optimizer)
+
+        if self.operator not in FOLDABLE_OPERATORS:
+            return self
+
+        if _is_constant(self.left) and _is_constant(self.right):
+            left = _constant_value(self.left)
+            right = _constant_value(self.right)
+            if self.operator == "+":
+                value = left + right
+            elif self.operator == "-":
+                value = left - right
+            elif self.operator == "!=":
+                value = int(left != right)
+            else:
+                value = int(left <= right)
+
+            if -2 ** 31 <= value < 2 ** 31:
+                return optimizer.replaced(ast.Int32(value=value))
+        elif self.operator == "+" or self.operator == "-":
+            if _is_zero(self.right) and _is_int_valued(self.left):
+                return optimizer.replaced(self.left)  # x + 0, x - 0
+            elif self.operator == "+" and _is_zero(self.left):
+                if _is_int_valued(self.right):
+                    return optimizer.replaced(self.right)  # 0 + x
+        return self
+
+
+class __extend__(ast.VariableDeclaration):
+    def optimize(self, optimizer):
+        if self.value is not None:
+            self.value = self.value.optimize(optimizer=optimizer)
+        return self
+
+
+class __extend__(ast.Assignment):
+    def optimize(self, optimizer):
+        self.right = self.right.optimize(optimizer=optimizer)
+        return self
+
+
+class __extend__(ast.ArrayDereference):
+    def optimize(self, optimizer):
+        self.index = self.index.optimize(optimizer=optimizer)
+        return self
+
+
+class __extend__(ast.ReturnStatement):
+    def optimize(self, optimizer):
+        if self.value is not None:
+            self.value = self.value.optimize(optimizer=optimizer)
+        return self
+
+
+class __extend__(ast.Call):
+    def optimize(self, optimizer):
+        self.args = [arg.optimize(optimizer=optimizer) for arg in self.args]
+        return self
+
+
+class __extend__(ast.For):
+    def optimize(self, optimizer):
+        self.body = self.body.optimize(optimizer=optimizer)
+        if self.condition is None:
+            return self
+
+        self.condition = self.condition.optimize(optimizer=optimizer)
+        if not _is_constant(self.condition):
+            return self
+        elif _constant_value(self.condition) != 0:
+            # Loop forever, without checking the condition each time around.
+            self.condition = None
+            return optimizer.replaced(self)
+        else:
+            return optimizer.replaced(None)
+
+
+class __extend__(ast.If):
+    def optimize(self, optimizer):
+        self.condition = self.condition.optimize(optimizer=optimizer)
+        self.body = self.body.optimize(optimizer=optimizer)
+
+        if not _is_constant(self.condition):
+            return self
+        elif _constant_value(self.condition) != 0:
+            return optimizer.replaced(self.body)
+        else:
+            return optimizer.replaced(None)
@@ -254,7 +254,7 @@ class Program(Node):
         self.units = units
 
     def add_unit(self, unit):
-        self.units.insert(0, unit)
+        self.units.append(unit)
 
 
 @attributes(
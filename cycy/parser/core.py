@@ -1,6 +1,7 @@
 from characteristic import Attribute, attributes
 from rply import ParserGenerator
 from rply.errors import LexingError as _RPlyLexingError
+from rpython.rlib.streamio import open_file_as_stream
 
 from cycy.exceptions import CyCyError
 from cycy.parser.ast import (
@@ -29,7 +30,7 @@ from cycy.parser.ast import (
     VariableDeclaration,
     Type,
 )
-from cycy.parser.lexer import RULES, lexer
+from cycy.parser.lexer import RULES, TYPES, lexer
 from cycy.parser.preprocessor import Preprocessor
 
 
@@ -60,7 +61,7 @@ class ParseError(CyCyError):
         token_type = self.token.gettokentype()
         token_value = self.token.value
 
-        source_pos = self.token.source_pos
+        source_pos = self.token.getsourcepos()
         if source_pos is None:
             return "Unexpected %s %s" % (token_type, token_value)
 
@@ -135,14 +136,69 @@ class _Parser(object):
     apply_with_init=False,
 )
 class Parser(_Parser):
+    """
+    .. attribute:: dependencies
+
+        the paths of the files included by the most recently parsed source
+
+    .. attribute:: missed
+
+        the paths searched for those files before they were found, which
+        didn't exist (but would be included instead if they did)
+
+    """
+
     def __init__(self, preprocessor=None, lexer=lexer):
         if preprocessor is None:
             preprocessor = Preprocessor()
         self.preprocessor = preprocessor
         self.lexer = lexer
+        self.dependencies = []
+        self.missed = []
+
+    def search_path(self):
+        """
+        Describe where includes are searched for, so that bytecode cached
+        for one search path isn't reused for another.
+
+        """
+
+        return self.preprocessor.search_path()
+
+    def forget_missing(self):
+        self.preprocessor.forget_missing()
 
     def parse(self, source):
-        tokens = self.lexer.lex(source)
+        return self._parse(
+            tokens=self.lexer.lex(source).compact(lazy=True), source=source,
+        )
+
+    def parse_file(self, path):
+        """
+        Parse the source in the file at the given path, lexing it a chunk at
+        a time rather than reading it whole (unless it has a parse error,
+        which is shown in context).
+
+        """
+
+        try:
+            return self._parse(
+                tokens=self.lexer.lex_file(path).compact(lazy=True),
+                source="",
+            )
+        except ParseError as error:
+            error.source = _read(path)
+            raise
+
+    def _parse(self, tokens, source):
+        """
+        Parse a :class:`cycy.parser.lexer.TokenList`, which Token objects
+        (and their positions) are only made from as the parser takes them.
+
+        """
+
+        self.dependencies = []
+        self.missed = []
         preprocessed = self.preprocessor.preprocessed(
             tokens=tokens, parser=self,
         )
@@ -169,10 +225,10 @@ class Parser(_Parser):
     def program_function(self, p):
         return Program([p[0]])
 
-    @_pg.production("program : unit program")
-    def program_unit_program(self, p):
-        p[1].add_unit(p[0])
-        return p[1]
+    @_pg.production("program : program unit")
+    def program_program_unit(self, p):
+        p[0].add_unit(p[1])
+        return p[0]
 
     @_pg.production("return_statement : return expr ;")
     def return_statement(self, p):
@@ -246,11 +302,10 @@ class Parser(_Parser):
     def statement_list_statement(self, p):
         return NodeList([p[0]])
 
-    @_pg.production("statement_list : statement statement_list")
+    @_pg.production("statement_list : statement_list statement")
     def statement_list_statement_list(self, p):
-        st = NodeList([p[0]])
-        st.extend(p[1].get_items())
-        return st
+        p[0].append(p[1])
+        return p[0]
 
     @_pg.production("statement : return_statement")
     @_pg.production("statement : expr ;")
@@ -318,6 +373,11 @@ class Parser(_Parser):
     def param_list(self, p):
         return NodeList(items=[p[0]] if p else None)
 
+    @_pg.production("param_list : param_list , expr")
+    def param_list_param(self, p):
+        p[0].append(p[2])
+        return p[0]
+
     @_pg.production("assignment : IDENTIFIER = expr")
     def assign(self, p):
         return Assignment(left=Variable(p[0].getstr()), right=p[2])
@@ -514,8 +574,19 @@ class _ParseState(object):
 
 @attributes([Attribute(name="parser")], apply_with_init=False)
 class IncrementalParser(_Parser):
+    """
+    Parses input that arrives a piece (say, a line) at a time.
+
+    Pieces are buffered until they form a complete program. Each new piece
+    is lexed on its own to track how deeply nested its brackets leave the
+    input, and the buffer is only parsed once none are left open, so
+    that the cost of each piece is proportional to its length rather
+    than to that of everything buffered.
+
+    """
 
     buffer = ""
+    _depth = 0
 
     def __init__(self, parser=None):
         if parser is None:
@@ -526,11 +597,79 @@ class IncrementalParser(_Parser):
     def input_in_progress(self):
         return bool(self.buffer)
 
+    @property
+    def dependencies(self):
+        return self.parser.dependencies
+
+    @property
+    def missed(self):
+        return self.parser.missed
+
+    def search_path(self):
+        return self.parser.search_path()
+
+    def forget_missing(self):
+        self.parser.forget_missing()
+
     def parse(self, source):
+        self.buffer += source
+        try:
+            self._depth += _nesting(lexer=self.parser.lexer, source=source)
+        except _RPlyLexingError:
+            self._depth = 0  # so that parsing reports the error
+        if self._depth > 0:
+            return None
+
         try:
-            ast = self.parser.parse(self.buffer + source)
+            ast = self.parser.parse(self.buffer)
         except UnexpectedEnd:
-            self.buffer += source
-        else:
-            self.buffer = ""
-            return ast
+            return None
+        except CyCyError:
+            self._reset()
+            raise
+        self._reset()
+        return ast
+
+    def parse_file(self, path):
+        """
+        Parse a whole file, which (unlike a piece of input) is never
+        continued, so is left out of the buffer.
+
+        """
+
+        try:
+            return self.parser.parse_file(path=path)
+        except UnexpectedEnd:
+            return None
+
+    def _reset(self):
+        self.buffer = ""
+        self._depth = 0
+
+
+_OPENING = ["LEFT_PARENTHESIS", "LEFT_CURLY_BRACE", "LEFT_SQUARE_BRACKET"]
+_CLOSING = ["RIGHT_PARENTHESIS", "RIGHT_CURLY_BRACE", "RIGHT_SQUARE_BRACKET"]
+
+
+def _read(path):
+    source_file = open_file_as_stream(path)
+    try:
+        return source_file.readall()
+    finally:
+        source_file.close()
+
+
+def _nesting(lexer, source):
+    """
+    How many more brackets the source opens than it closes.
+
+    """
+
+    depth = 0
+    for type_id in lexer.lex(source).compact().types:
+        name = TYPES[type_id]
+        if name in _OPENING:
+            depth += 1
+        elif name in _CLOSING:
+            depth -= 1
+    return depth
@@ -1,4 +1,12 @@
+import os
+
 from rply import LexerGenerator
+from rply.errors import LexingError
+from rply.token import SourcePosition
+from rply.token import Token as _RPlyToken
+from rpython.rlib import rmmap
+from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.streamio import open_file_as_stream
 
 RULES = [
     "INCLUDE",
@@ -47,8 +55,576 @@ RULES = [
     "/",
     "%",
 ]
+
+
+KEYWORDS = {
+    "__asm__": "ASM",
+    "asm": "ASM",
+    "char": "CHAR",
+    "short": "SHORT",
+    "int": "INT",
+    "long": "LONG",
+    "float": "FLOAT",
+    "double": "DOUBLE",
+    "NULL": "null",
+    "const": "CONST",
+    "unsigned": "UNSIGNED",
+    "return": "return",
+    "void": "void",
+    "if": "if",
+    "while": "while",
+    "for": "for",
+}
+
+# Punctuation which is a token on its own, whatever follows it.
+SINGLE = {
+    "[": "LEFT_SQUARE_BRACKET",
+    "]": "RIGHT_SQUARE_BRACKET",
+    "(": "LEFT_PARENTHESIS",
+    ")": "RIGHT_PARENTHESIS",
+    "{": "LEFT_CURLY_BRACE",
+    "}": "RIGHT_CURLY_BRACE",
+    ",": ",",
+    ";": ";",
+    "*": "*",
+    "/": "/",
+    "%": "%",
+}
+
+# Punctuation which may begin a two character token, and what it is alone
+# (if anything).
+DOUBLE = {
+    "|": ("||", ""),
+    "&": ("&&", ""),
+    "+": ("++", "+"),
+    "-": ("--", "-"),
+    "=": ("==", "="),
+    "!": ("!=", ""),
+    "<": ("<=", "<"),
+    ">": (">=", ">"),
+}
+
+WHITESPACE = " \t\n\r\f\v"
+
+# How much of a file to read at once when lexing from a stream.
+CHUNK_SIZE = 64 * 1024
+
+
+class Lexer(object):
+    """
+    A hand-written, single pass lexer.
+
+    It dispatches on the first character of each token, and looks up each
+    identifier it scans in :data:`KEYWORDS`. The tokens (and their source
+    positions) are as produced by :data:`regex_lexer`, except that keywords
+    are only recognised as whole identifiers (``integer`` is not ``int``
+    followed by ``eger``), and that string literals end at the first
+    unescaped quote rather than the last one on the line.
+
+    """
+
+    def lex(self, source):
+        return LexerStream(source)
+
+    def lex_stream(self, stream, chunk_size=CHUNK_SIZE):
+        """
+        Lex the contents of a :class:`rpython.rlib.streamio.Stream`,
+        reading it a chunk at a time rather than all at once.
+
+        """
+
+        reader = _StreamReader(stream)
+        return LexerStream("", chunks=_Chunks(reader, chunk_size))
+
+    def lex_file(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Lex the file at the given path, a chunk at a time, so that it's
+        never in memory whole.
+
+        Once translated, the file is memory mapped (see :meth:`lex_mapped`).
+        Untranslated, copying out of a mapping goes a character at a time,
+        so the file is read instead.
+
+        """
+
+        if we_are_translated():
+            return self.lex_mapped(path, chunk_size)
+        reader = _StreamReader(open_file_as_stream(path), close_at_end=True)
+        return LexerStream("", chunks=_Chunks(reader, chunk_size))
+
+    def lex_mapped(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Memory map the file at the given path and lex it from the mapping,
+        a chunk at a time. Files which can't be mapped (like pipes) are
+        read instead.
+
+        A :class:`TokenList` of the tokens only keeps their offsets into the
+        mapping, reading each one's text from it when the token is needed
+        (other than those whose text is always the same, like keywords).
+        The mapping is then left open, for as long as the process runs.
+
+        """
+
+        mapped = None
+        fd = os.open(path, os.O_RDONLY, 0)
+        try:
+            try:
+                mapped = _MappedReader(
+                    rmmap.mmap(fd, 0, access=rmmap.ACCESS_READ),
+                )
+                reader = mapped
+            except (rmmap.RValueError, OSError):
+                # Empty files can't be mapped either, but read just fine.
+                reader = _StreamReader(
+                    open_file_as_stream(path), close_at_end=True,
+                )
+        finally:
+            os.close(fd)
+        return LexerStream(
+            "", chunks=_Chunks(reader, chunk_size), mapped=mapped,
+        )
+
+
+class LexerStream(object):
+    """
+    Tokens scanned from a source, or from a series of chunks of one.
+
+    Chunks must end at the end of a line (as those from :class:`_Chunks`
+    do). No token spans a newline, so no token is then split between two
+    chunks, and each chunk can be dropped once it has been scanned.
+
+    .. attribute:: lines
+
+        the :class:`LineIndex` of the lines scanned so far
+
+    .. attribute:: mapped
+
+        the :class:`_MappedReader` the chunks are read from, if they're
+        read from a memory mapping
+
+    """
+
+    def __init__(self, source, chunks=None, mapped=None):
+        self.source = source
+        self.chunks = chunks
+        self.mapped = mapped
+        self.idx = 0
+        self.lines = LineIndex()
+
+        # the index (in the whole source) of the start of self.source
+        self._offset = 0
+
+        # the token most recently scanned
+        self._name = ""
+        self._value = ""
+        self._start = 0
+        self._end = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if not self._scan():
+            raise StopIteration
+        return Token(self._name, self._text(), self.lines, self._start)
+
+    def __next__(self):
+        return self.next()
+
+    def compact(self, lazy=False):
+        """
+        Scan the remaining tokens into a :class:`TokenList`, without
+        creating an object for each.
+
+        If lazy, each is only scanned as the list is iterated over (so that
+        an error in parsing its tokens is found before any later error in
+        lexing them).
+
+        """
+
+        tokens = TokenList(lines=self.lines, stream=self)
+        if not lazy:
+            while tokens.scan():
+                pass
+        return tokens
+
+    def _scan(self):
+        """
+        Scan the next token, returning whether there was one.
+
+        """
+
+        source = self.source
+        end = len(source)
+
+        i = self.idx
+        while True:
+            while i < end and source[i] in WHITESPACE:
+                if source[i] == "\n":
+                    self.lines.add(self._offset + i + 1)
+                i += 1
+            if i < end or self.chunks is None:
+                break
+            self._offset += end
+            source = self.source = self.chunks.next()
+            end = len(source)
+            i = 0
+            if not source:
+                break
+        self.idx = i
+        if i >= end:
+            return False
+
+        char = source[i]
+        if char.isalpha() or char == "_":
+            j = _identifier_end(source, i + 1)
+            value = source[i:j]
+            name = KEYWORDS.get(value, "IDENTIFIER")
+            if name == "IDENTIFIER" and self.mapped is not None:
+                value = ""  # read from the mapping instead, when needed
+            return self._found(name, j, value)
+        elif char.isdigit():
+            j = _digits_end(source, i + 1)
+            if (
+                j + 1 < end and
+                source[j] == "." and
+                source[j + 1].isdigit()
+            ):
+                return self._found("FLOAT_LITERAL", _digits_end(source, j + 1))
+            return self._found("INTEGER_LITERAL", j)
+        elif char in SINGLE:
+            return self._found(SINGLE[char], i + 1, char)
+        elif char in DOUBLE:
+            pair, alone = DOUBLE[char]
+            if i + 1 < end and source[i + 1] == pair[1]:
+                return self._found(pair, i + 2, pair)
+            elif alone:
+                return self._found(alone, i + 1, alone)
+        elif char == '"':
+            j = _string_end(source, i + 1)
+            if j != -1:
+                return self._found("STRING_LITERAL", j)
+        elif char == "'":
+            j = _char_end(source, i + 1)
+            if j != -1:
+                return self._found("CHAR_LITERAL", j)
+        elif char == "#" and source[i:i + len("#include")] == "#include":
+            return self._found("INCLUDE", i + len("#include"), "#include")
+        elif char == "#" and source[i:i + len("#pragma")] == "#pragma":
+            return self._found("PRAGMA", _line_end(source, i))
+        raise LexingError(None, self.lines.position(self._offset + i))
+
+    def _found(self, name, end, value=""):
+        """
+        Record the token which ends at the given index, whose value is the
+        source it spans unless given (say, because it's always the same).
+
+        """
+
+        start = self.idx
+        assert end >= start >= 0
+        self._name = name
+        self._value = value
+        self._start = self._offset + start
+        self._end = self._offset + end
+        self.idx = end
+        return True
+
+    def _text(self):
+        """
+        The value of the token most recently scanned.
+
+        """
+
+        if self._value:
+            return self._value
+        start = self._start - self._offset
+        end = self._end - self._offset
+        assert start >= 0
+        assert end >= 0
+        return self.source[start:end]
+
+
+class LineIndex(object):
+    """
+    The offsets at which each line of a source starts, from which the line
+    and column of an offset are worked out only when they're needed.
+
+    """
+
+    def __init__(self):
+        self.starts = [0]
+
+    def add(self, start):
+        self.starts.append(start)
+
+    def position(self, offset):
+        starts = self.starts
+        low, high = 0, len(starts)
+        while high - low > 1:  # find the last line starting at or before
+            middle = (low + high) // 2
+            if starts[middle] <= offset:
+                low = middle
+            else:
+                high = middle
+        return SourcePosition(offset, low + 1, offset - starts[low] + 1)
+
+
+class Token(_RPlyToken):
+    """
+    A token which works out its line and column only when asked for them.
+
+    """
+
+    def __init__(self, name, value, lines, offset):
+        self.name = name
+        self.value = value
+        self.source_pos = None
+        self.lines = lines
+        self.offset = offset
+
+    def getsourcepos(self):
+        return self.lines.position(self.offset)
+
+
+# The type of every token the lexer produces, indexed by TokenList.types.
+TYPES = RULES + ["PRAGMA"]
+_TYPE_IDS = dict((name, i) for i, name in enumerate(TYPES))
+
+
+class TokenList(object):
+    """
+    Tokens stored compactly, as parallel lists of each token's type (an
+    index into :data:`TYPES`), offset and value, rather than as an object
+    (and source position) each.
+
+    A :class:`Token` is only created for each token as the list is iterated
+    over.
+
+    .. attribute:: stream
+
+        the :class:`LexerStream` whose tokens are still to be scanned into
+        the list, if any
+
+    .. attribute:: mapped
+
+        the :class:`_MappedReader` from which the text of tokens whose value
+        is None is read, if any
+
+    """
+
+    def __init__(self, lines=None, stream=None):
+        if lines is None:
+            lines = LineIndex()
+        self.lines = lines
+        self.stream = stream
+        self.mapped = None if stream is None else stream.mapped
+        self.types = []
+        self.offsets = []
+        self.ends = []
+        self.values = []
+
+    def __iter__(self):
+        return _TokenListIterator(self)
+
+    def append(self, name, offset, end, value):
+        self.types.append(_TYPE_IDS[name])
+        self.offsets.append(offset)
+        self.ends.append(end)
+        self.values.append(value)
+
+    def scan(self):
+        """
+        Scan another token from the stream, returning whether there was one.
+
+        """
+
+        stream = self.stream
+        if stream is None:
+            return False
+        if not stream._scan():
+            self.stream = None
+            return False
+        if self.mapped is not None and not stream._value:
+            value = None  # read from the mapping if the token is needed
+        else:
+            value = stream._text()
+        self.append(stream._name, stream._start, stream._end, value)
+        return True
+
+    def token(self, index):
+        start = self.offsets[index]
+        value = self.values[index]
+        if value is None:
+            value = self.mapped.text(start, self.ends[index])
+        return Token(TYPES[self.types[index]], value, self.lines, start)
+
+
+class _TokenListIterator(object):
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.index >= len(self.tokens.types) and not self.tokens.scan():
+            raise StopIteration
+        token = self.tokens.token(self.index)
+        self.index += 1
+        return token
+
+    def __next__(self):
+        return self.next()
+
+
+class _Chunks(object):
+    """
+    Reads a :class:`_Reader` in chunks of (about) the given size, each
+    ending at the end of a line, or at the end of the stream.
+
+    A line longer than the chunk size is read whole, into one chunk.
+
+    """
+
+    def __init__(self, reader, size):
+        self.reader = reader
+        self.size = size
+        self._rest = ""
+
+    def next(self):
+        """
+        The next chunk, or the empty string at the end of the stream.
+
+        """
+
+        pieces = [self._rest]
+        while True:
+            data = self.reader.read(self.size)
+            if not data:
+                self._rest = ""
+                return "".join(pieces)
+            end = data.rfind("\n")
+            if end < 0:
+                pieces.append(data)
+            else:
+                pieces.append(data[:end + 1])
+                self._rest = data[end + 1:]
+                return "".join(pieces)
+
+
+class _Reader(object):
+    def read(self, n):
+        raise NotImplementedError()
+
+
+class _StreamReader(_Reader):
+    def __init__(self, stream, close_at_end=False):
+        self.stream = stream
+        self.close_at_end = close_at_end
+        self.finished = False
+
+    def read(self, n):
+        if self.finished:
+            return ""
+        data = self.stream.read(n)
+        if not data and self.close_at_end:
+            self.stream.close()
+            self.finished = True
+        return data
+
+
+class _MappedReader(_Reader):
+    """
+    Reads from a memory mapped file.
+
+    The mapping is never unmapped, since the text of tokens may still be
+    read from it (see :meth:`text`) after it's all been read.
+
+    """
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def read(self, n):
+        return self.mapping.read(n)
+
+    def text(self, start, end):
+        """
+        The text between the given offsets into the file.
+
+        """
+
+        return self.mapping.getslice(start, end - start)
+
+
+def _line_end(source, i):
+    end = source.find("\n", i)
+    if end == -1:
+        return len(source)
+    return end
+
+
+def _identifier_end(source, i):
+    while i < len(source) and (source[i].isalnum() or source[i] == "_"):
+        i += 1
+    return i
+
+
+def _digits_end(source, i):
+    while i < len(source) and source[i].isdigit():
+        i += 1
+    return i
+
+
+def _string_end(source, i):
+    """
+    The end of a string literal whose contents start at i, or -1.
+
+    """
+
+    while i < len(source):
+        char = source[i]
+        if char == '"':
+            return i + 1
+        elif char == "\n":
+            break
+        elif char == "\\":
+            i += 1
+            if i < len(source) and source[i] == "\n":
+                break
+        i += 1
+    return -1
+
+
+def _char_end(source, i):
+    """
+    The end of a character literal whose contents start at i, or -1.
+
+    """
+
+    # an (optionally escaped) character followed by a quote
+    if source[i:i + 1] == "\\" and _is_char(source, i + 1):
+        if source[i + 2:i + 3] == "'":
+            return i + 3
+    if _is_char(source, i) and source[i + 1:i + 2] == "'":
+        return i + 2
+    return -1
+
+
+def _is_char(source, i):
+    return i < len(source) and source[i] != "\n"
+
+
+lexer = Lexer()
+
+
+# The original lexer, a regular expression per token, tried in order. It is
+# kept as a reference for the tests and for benchmarks/lexer.py.
 lg = LexerGenerator()
 lg.add("INCLUDE", "#include")
+lg.add("PRAGMA", "#pragma[^\n]*")
 lg.add("ASM", "__asm__")
 lg.add("ASM", "asm")
 lg.add("FLOAT_LITERAL", "\d+\.\d+")
@@ -95,4 +671,4 @@ lg.add("*", "\*")
 lg.add("/", "/")
 lg.add("%", "%")
 lg.ignore("\s+")
-lexer = lg.build()
+regex_lexer = lg.build()
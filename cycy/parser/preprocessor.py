@@ -1,6 +1,22 @@
 from characteristic import Attribute, attributes
 
 from cycy import include
+from cycy.exceptions import CyCyError
+from cycy.stdlib.headers import HEADERS, VERSION
+
+
+# Deep enough for any sensible program, but stops a header which includes
+# itself (without saying #pragma once) from recursing forever.
+MAX_INCLUDE_DEPTH = 200
+
+
+@attributes([Attribute(name="path")], apply_with_init=False)
+class IncludeTooDeep(CyCyError):
+    def __init__(self, path):
+        self.path = path
+
+    def __str__(self):
+        return "#include nested too deeply (including '%s')" % (self.path,)
 
 
 @attributes(
@@ -15,28 +31,97 @@ class Preprocessor(object):
 
     def preprocessed(self, tokens, parser):
         """
-        Preprocess a stream of tokens.
+        Preprocess a :class:`cycy.parser.lexer.TokenList`.
+
+        Includes are expanded recursively. A header which says
+        ``#pragma once`` is only expanded the first time it is included
+        (per stream), later includes of it are skipped without looking at
+        its tokens again.
 
         """
 
+        return self._preprocessed(
+            tokens=iter(tokens),
+            parser=parser,
+            current="",
+            once={},
+            depth=0,
+        )
+
+    def _preprocessed(self, tokens, parser, current, once, depth):
+        # (tokens is always a TokenList's iterator, for the source and for
+        # each header it includes alike, since RPython can't mix the two)
         for token in tokens:
             if token.name == "INCLUDE":
-                name = next(tokens).value.strip('"')
+                name = tokens.next().value.strip('"')
                 included = self.include(name=name, parser=parser)
-                for token in included.tokens:
+                key = included.path
+                if key is None:
+                    key = name
+                if key in once:
+                    continue
+                if depth >= MAX_INCLUDE_DEPTH:
+                    raise IncludeTooDeep(path=key)
+                if included.path is not None:
+                    parser.dependencies.append(included.path)
+                for token in self._preprocessed(
+                    tokens=iter(included.tokens),
+                    parser=parser,
+                    current=key,
+                    once=once,
+                    depth=depth + 1,
+                ):
                     yield token
+            elif token.name == "PRAGMA":
+                # Unknown pragmas are ignored, as C says they should be.
+                if _pragma(token.value) == "once" and current:
+                    once[current] = None
             else:
                 yield token
 
+    def search_path(self):
+        return "\n".join(
+            [includer.search_path() for includer in self.includers],
+        )
+
+    def forget_missing(self):
+        """
+        Look again for headers which were missing, which may since exist.
+
+        Missing headers are remembered until this is called, so that the
+        sources of a program (which are preprocessed one after another)
+        don't each search the same directories for them again.
+
+        """
+
+        for includer in self.includers:
+            includer.forget_missing()
+
     def include(self, name, parser):
+        missed = []
         for includer in self.includers:
             try:
-                return includer.include(name=name, parser=parser)
+                included = includer.include(name=name, parser=parser)
             except include.NotFound:
-                pass
+                candidate = includer.candidate(name)
+                if candidate is not None:
+                    missed.append(candidate)
+                continue
+            parser.missed.extend(missed)
+            return included
         raise include.NotFound(path=name, searched=self.includers)
 
 
+def _pragma(directive):
+    """
+    The words of a ``#pragma`` directive, without the ``#pragma``.
+
+    """
+
+    words = [word for word in directive.split(" ") if word]
+    return " ".join(words[1:])
+
+
 def with_directories(directories):
     return Preprocessor(
         includers=[
@@ -47,6 +132,7 @@ def with_directories(directories):
 
 
 _DEFAULT_INCLUDE = [
+    include.StandardLibraryIncluder(libraries=HEADERS, version=VERSION),
     include.DirectoryIncluder(path="/usr/local/include/"),
     include.DirectoryIncluder(path="/usr/include/"),
 ]
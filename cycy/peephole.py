@@ -0,0 +1,128 @@
+"""
+A peephole optimiser run over each compiled :class:`cycy.compiler.Tape`.
+
+"""
+
+from cycy import bytecode
+
+
+def optimized(tape):
+    """
+    Optimise the instructions on a tape, returning new instructions.
+
+    Jumps to unconditional jumps are threaded straight through to their
+    final target, unreachable instructions (and jumps to the very next
+    instruction) are removed, and a ``STORE_VARIABLE`` followed by a
+    ``LOAD_VARIABLE`` of the same slot keeps the stored value on the stack
+    rather than reloading it. Jump targets are relocated to match.
+
+    """
+
+    opcodes = [tape[offset] for offset in xrange(0, len(tape), 2)]
+    args = [tape[offset + 1] for offset in xrange(0, len(tape), 2)]
+    count = len(opcodes)
+
+    _thread_jumps(opcodes, args)
+    kept = _reachable(opcodes, args)
+    _remove_jumps_to_next(opcodes, args, kept)
+    _forward_stores(opcodes, args, kept)
+
+    # Where each instruction (or the end of the tape) ends up. Removed
+    # instructions map to wherever the next kept instruction does.
+    offsets = [0] * (count + 1)
+    offset = 0
+    for i in xrange(count):
+        offsets[i] = offset
+        if kept[i]:
+            offset += 2
+    offsets[count] = offset
+
+    result = []
+    for i in xrange(count):
+        if not kept[i]:
+            continue
+        arg = args[i]
+        if opcodes[i] in bytecode.JUMPS:
+            arg = offsets[arg // 2]
+        result.append(opcodes[i])
+        result.append(arg)
+    return result
+
+
+def _thread_jumps(opcodes, args):
+    count = len(opcodes)
+    for i in xrange(count):
+        if opcodes[i] not in bytecode.JUMPS:
+            continue
+        target = args[i] // 2
+
+        # Bounded, since a chain of jumps may be an infinite loop.
+        for _ in xrange(count):
+            if target >= count or opcodes[target] != bytecode.JUMP:
+                break
+            target = args[target] // 2
+        args[i] = 2 * target
+
+
+def _reachable(opcodes, args):
+    count = len(opcodes)
+    reachable = [False] * count
+    pending = [0]
+    while pending:
+        i = pending.pop()
+        while 0 <= i < count and not reachable[i]:
+            reachable[i] = True
+            opcode = opcodes[i]
+            if opcode == bytecode.RETURN:
+                break
+            elif opcode == bytecode.JUMP:
+                i = args[i] // 2
+            else:
+                if opcode in bytecode.JUMPS:
+                    pending.append(args[i] // 2)
+                i += 1
+    return reachable
+
+
+def _next_kept(kept, i):
+    i += 1
+    while i < len(kept) and not kept[i]:
+        i += 1
+    return i
+
+
+def _remove_jumps_to_next(opcodes, args, kept):
+    for i in xrange(len(opcodes)):
+        if kept[i] and opcodes[i] == bytecode.JUMP:
+            target = args[i] // 2
+            if target > i and _next_kept(kept, i) >= target:
+                kept[i] = False
+
+
+def _jump_targets(opcodes, args, kept):
+    targets = [False] * (len(opcodes) + 1)
+    for i in xrange(len(opcodes)):
+        if kept[i] and opcodes[i] in bytecode.JUMPS:
+            target = args[i] // 2
+            if target < len(opcodes) and not kept[target]:
+                target = _next_kept(kept, target)
+            targets[target] = True
+    return targets
+
+
+def _forward_stores(opcodes, args, kept):
+    targets = _jump_targets(opcodes, args, kept)
+    for i in xrange(len(opcodes)):
+        if not kept[i] or opcodes[i] != bytecode.STORE_VARIABLE:
+            continue
+        following = _next_kept(kept, i)
+        if (
+            following < len(opcodes) and
+            not targets[following] and
+            opcodes[following] == bytecode.LOAD_VARIABLE and
+            args[following] == args[i]
+        ):
+            # STORE x; LOAD x  =>  DUP; STORE x
+            opcodes[following] = bytecode.STORE_VARIABLE
+            opcodes[i] = bytecode.DUP
+            args[i] = bytecode.NO_ARG
@@ -31,6 +31,7 @@ class REPL(object):
         self.show_banner()
         while True:
             self.stdout.write(self.prompt)
+            self.stdout.flush()
 
             try:
                 repl_input = self.stdin.readline()
@@ -39,6 +40,7 @@ class REPL(object):
                 continue
 
             if not repl_input:
+                self.stdout.flush()
                 return
             elif not repl_input.strip():
                 continue
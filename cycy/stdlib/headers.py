@@ -0,0 +1,46 @@
+"""
+The headers of the standard library, lexed once when CyCy is imported.
+
+Once translated, the tokens are prebuilt into the binary, so including one
+of these headers never touches the filesystem. Since they aren't files, the
+bytecode cache can't track them as dependencies; :data:`VERSION` (a digest
+of them all) is part of its key instead.
+
+"""
+
+import os
+
+from rpython.rlib.rmd5 import RMD5
+
+from cycy.include import Included
+from cycy.parser.lexer import lexer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+INCLUDE = os.path.join(ROOT, "include")
+
+
+def _lexed(directory):
+    """
+    Lex every header under the directory, returning them along with a
+    version (a digest of all of their contents).
+
+    """
+
+    headers = {}
+    md5 = RMD5()
+    for parent, directories, files in os.walk(directory):
+        directories.sort()
+        for name in sorted(files):
+            if not name.endswith(".h"):
+                continue
+            path = os.path.join(parent, name)
+            with open(path) as header:
+                source = header.read()
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            md5.update(relative + "\0" + source + "\0")
+            headers[relative] = Included(tokens=lexer.lex(source).compact())
+    return headers, md5.hexdigest()
+
+
+HEADERS, VERSION = _lexed(INCLUDE)
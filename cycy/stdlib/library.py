@@ -0,0 +1,38 @@
+"""
+The standard library, compiled once when CyCy is imported.
+
+Every source under ``lib/`` is compiled (with the peephole optimiser) and
+the results linked together into :data:`LIBRARY`, whose functions resolve
+the calls a program makes to functions it doesn't define itself.
+
+"""
+
+import os
+
+from cycy.compiler import Compiler
+from cycy.linker import link
+from cycy.parser.core import Parser
+from cycy.stdlib.headers import ROOT
+
+
+LIB = os.path.join(ROOT, "lib")
+
+
+def _compiled(directory):
+    parser = Parser()
+
+    units = []
+    for parent, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.endswith(".c"):
+                continue
+            with open(os.path.join(parent, name)) as source:
+                program = parser.parse(source.read())
+            compiler = Compiler(peephole=True)
+            compiler.compile(program)
+            units.append(compiler.unit())
+    link(units)
+    return units
+
+
+LIBRARY = _compiled(LIB)
@@ -1,6 +0,0 @@
-def tokens():
-    return []
-
-
-def printf(format):
-    print format
@@ -0,0 +1,162 @@
+from textwrap import dedent
+from unittest import TestCase
+
+from rpython.rlib import streamio
+
+from cycy import builtins
+from cycy.bytecode import cleaned
+from cycy.compiler import Compiler
+from cycy.interpreter import CyCy
+from cycy.linker import ConflictingDeclaration, link
+from cycy.objects import W_Int32
+from cycy.parser.core import Parser
+from cycy.stdlib.library import LIBRARY
+from cycy.tests.util import Input, Recorder
+
+
+class TestBuiltins(TestCase):
+    def interpret(self, body, **kwargs):
+        return CyCy(**kwargs).interpret(
+            ["int main(void) { " + body + " }"],
+        )
+
+    def test_puts(self):
+        stdout = Recorder()
+        w_return = self.interpret('return puts("hi");', stdout=stdout)
+        self.assertEqual(
+            (w_return, "".join(stdout.writes)), (W_Int32(3), "hi\n"),
+        )
+
+    def test_strlen(self):
+        self.assertEqual(
+            self.interpret('return strlen("hello");'), W_Int32(5),
+        )
+
+    def test_strcmp_equal(self):
+        self.assertEqual(
+            self.interpret('return strcmp("abc", "abc");'), W_Int32(0),
+        )
+
+    def test_strcmp_less(self):
+        self.assertEqual(
+            self.interpret('return strcmp("abc", "abd");'), W_Int32(-1),
+        )
+
+    def test_strcmp_prefix(self):
+        self.assertEqual(
+            self.interpret('return strcmp("abc", "ab");'), W_Int32(ord("c")),
+        )
+
+    def test_abs(self):
+        self.assertEqual(self.interpret("return abs(0 - 7);"), W_Int32(7))
+
+    def test_getchar(self):
+        stdin = Input("x")
+        self.assertEqual(
+            self.interpret("return getchar();", stdin=stdin),
+            W_Int32(ord("x")),
+        )
+
+    def test_getchar_flushes_output(self):
+        stdout = Recorder()
+        shown = []
+
+        class Prompted(Input):
+            def read(self, n):
+                shown.append("".join(stdout.writes))
+                return Input.read(self, n)
+
+        self.interpret(
+            "putchar('?'); return getchar();",
+            stdin=Prompted("x"),
+            stdout=streamio.BufferingOutputStream(stdout),
+        )
+        self.assertEqual(shown, ["?"])
+
+    def test_getchar_at_eof(self):
+        stdin = Input("")
+        self.assertEqual(
+            self.interpret("return getchar();", stdin=stdin), W_Int32(-1),
+        )
+
+    def test_index_of(self):
+        index = builtins.index_of("strlen")
+        self.assertEqual(
+            (builtins.BUILTINS[index].name, builtins.index_of("nope")),
+            ("strlen", -1),
+        )
+
+
+class TestLinkingBuiltinCalls(TestCase):
+    def linked(self, source):
+        compiler = Compiler()
+        compiler.compile(Parser().parse(source=source))
+        link([compiler.unit()], libraries=LIBRARY)
+        return compiler
+
+    def dump(self, source):
+        compiler = self.linked(source)
+        main = compiler.constants[compiler.functions["main"]]
+        return main.bytecode.dump()
+
+    def test_builtin_call(self):
+        self.assertEqual(
+            self.dump('int main(void) { return strlen("abc"); }'),
+            dedent(
+                cleaned(
+                    """
+                    0 LOAD_CONST 1 => (char *)"abc"
+                    2 CALL_BUILTIN %s => strlen
+                    4 RETURN 1 (top of stack)
+                    (3 constants in pool)
+                    """ % (builtins.index_of("strlen"),),
+                ).strip("\n"),
+            ).strip("\n"),
+        )
+
+    def test_defined_functions_are_not_builtin(self):
+        dump = self.dump(
+            """
+            int strlen(const char * string) { return 3; }
+            int main(void) { return strlen("abc"); }
+            """,
+        )
+        self.assertIn("CALL 0", dump)
+
+    def test_functions_defined_later_are_not_builtin(self):
+        self.assertEqual(
+            CyCy().interpret(
+                [
+                    """
+                    int abs(int x);
+                    int main(void) { return abs(0 - 5); }
+                    int abs(int x) { return 42; }
+                    """,
+                ],
+            ),
+            W_Int32(42),
+        )
+
+    def test_functions_defined_by_other_units_are_not_builtin(self):
+        self.assertEqual(
+            CyCy().interpret(
+                [
+                    "int main(void) { return strlen(\"abc\"); }",
+                    "int strlen(const char * string) { return 42; }",
+                ],
+            ),
+            W_Int32(42),
+        )
+
+    def test_builtins_take_precedence_over_the_library(self):
+        self.assertIn(
+            "CALL_BUILTIN",
+            self.dump(
+                '#include "cycy/stdio.h"\n'
+                'int main(void) { return puts("hi"); }',
+            ),
+        )
+
+    def test_wrong_arity(self):
+        with self.assertRaises(ConflictingDeclaration):
+            self.dump('int main(void) { return strlen("abc", "def"); }')
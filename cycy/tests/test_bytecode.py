@@ -0,0 +1,122 @@
+from unittest import TestCase
+
+from cycy.bytecode import (
+    BINARY_ADD,
+    CALL,
+    JUMP,
+    JUMP_IF_NOT_ZERO,
+    JUMP_IF_ZERO,
+    LOAD_CONST,
+    LOAD_VARIABLE,
+    NO_ARG,
+    POP,
+    RETURN,
+    InvalidBytecode,
+    stack_size,
+)
+from cycy.compiler import Tape
+from cycy.objects import W_Function, W_Int32
+
+
+class TestStackSize(TestCase):
+    def test_straight_line(self):
+        self.assertEqual(
+            stack_size(
+                Tape(instructions=[
+                    LOAD_CONST, 0,
+                    LOAD_CONST, 0,
+                    LOAD_CONST, 0,
+                    BINARY_ADD, NO_ARG,
+                    BINARY_ADD, NO_ARG,
+                    RETURN, 1,
+                ]),
+                constants=[W_Int32(1)],
+            ),
+            3,
+        )
+
+    def test_loop(self):
+        self.assertEqual(
+            stack_size(
+                Tape(instructions=[
+                    LOAD_VARIABLE, 0,
+                    JUMP_IF_ZERO, 10,
+                    LOAD_VARIABLE, 0,
+                    POP, NO_ARG,
+                    JUMP, 0,
+                    RETURN, 0,
+                ]),
+                constants=[],
+            ),
+            1,
+        )
+
+    def test_call_pops_its_arguments(self):
+        w_function = W_Function(name="f", arity=2, bytecode=None)
+        self.assertEqual(
+            stack_size(
+                Tape(instructions=[
+                    LOAD_CONST, 0,
+                    LOAD_CONST, 0,
+                    CALL, 1,
+                    RETURN, 1,
+                ]),
+                constants=[W_Int32(1), w_function],
+            ),
+            2,
+        )
+
+    def test_empty(self):
+        self.assertEqual(stack_size(Tape(), constants=[]), 0)
+
+    def test_underflow(self):
+        with self.assertRaises(InvalidBytecode) as e:
+            stack_size(
+                Tape(instructions=[LOAD_CONST, 0, BINARY_ADD, NO_ARG]),
+                constants=[W_Int32(1)],
+            )
+        self.assertEqual(
+            e.exception,
+            InvalidBytecode(
+                offset=2, message="BINARY_ADD pops from an empty stack",
+            ),
+        )
+
+    def test_missing_constant(self):
+        with self.assertRaises(InvalidBytecode) as e:
+            stack_size(
+                Tape(instructions=[LOAD_CONST, 1, RETURN, 1]),
+                constants=[W_Int32(1)],
+            )
+        self.assertEqual(
+            e.exception, InvalidBytecode(offset=0, message="no constant 1"),
+        )
+
+    def test_return_from_empty_stack(self):
+        with self.assertRaises(InvalidBytecode):
+            stack_size(Tape(instructions=[RETURN, 1]), constants=[])
+
+    def test_jump_off_the_tape(self):
+        with self.assertRaises(InvalidBytecode):
+            stack_size(
+                Tape(instructions=[JUMP, 6, RETURN, 0]), constants=[],
+            )
+
+    def test_inconsistent_depths(self):
+        with self.assertRaises(InvalidBytecode) as e:
+            stack_size(
+                Tape(instructions=[
+                    LOAD_CONST, 0,
+                    LOAD_CONST, 0,
+                    JUMP_IF_NOT_ZERO, 8,
+                    LOAD_CONST, 0,
+                    RETURN, 1,
+                ]),
+                constants=[W_Int32(1)],
+            )
+        self.assertEqual(
+            e.exception,
+            InvalidBytecode(
+                offset=8, message="reached with stack depths 1 and 2",
+            ),
+        )
@@ -0,0 +1,153 @@
+from tempfile import mkdtemp
+from unittest import TestCase
+import shutil
+
+from bp.filepath import FilePath
+
+from cycy import cache
+from cycy.interpreter import CyCy
+from cycy.objects import W_Int32
+from cycy.parser import preprocessor
+from cycy.parser.core import Parser
+
+
+SOURCE = """
+#include "answer.h"
+int main(void) { return answer(2); }
+"""
+
+
+class ExplodingParser(object):
+    dependencies = []
+    missed = []
+
+    def __init__(self, search_path):
+        self._search_path = search_path
+
+    def search_path(self):
+        return self._search_path
+
+    def forget_missing(self):
+        pass
+
+    def parse(self, source):
+        raise AssertionError("Parsed %r instead of using the cache" % source)
+
+    def parse_file(self, path):
+        raise AssertionError("Parsed %s instead of using the cache" % path)
+
+
+class TestBytecodeCache(TestCase):
+    def setUp(self):
+        self.directory = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory.path)
+
+        self.header = self.directory.child("answer.h")
+        self.header.setContent("int answer(int x) { return x + 40; }\n")
+        self.source = self.directory.child("prog.c")
+        self.source.setContent(SOURCE)
+
+    def parser(self, directory=None):
+        if directory is None:
+            directory = self.directory
+        return Parser(
+            preprocessor=preprocessor.with_directories([directory.path]),
+        )
+
+    def interpret(self, parser=None, **kwargs):
+        if parser is None:
+            parser = self.parser()
+        cycy = CyCy(parser=parser, cache=cache.BytecodeCache(), **kwargs)
+        return cycy.interpret(
+            [self.source.getContent()], paths=[self.source.path],
+        )
+
+    def test_warm_runs_skip_the_front_end(self):
+        self.assertEqual(self.interpret(), W_Int32(42))
+        self.assertTrue(
+            FilePath(cache.cache_path(self.source.path)).exists(),
+        )
+        parser = ExplodingParser(search_path=self.parser().search_path())
+        self.assertEqual(self.interpret(parser=parser), W_Int32(42))
+
+    def test_sources_read_from_their_files(self):
+        cycy = CyCy(parser=self.parser(), cache=cache.BytecodeCache())
+        self.assertEqual(
+            cycy.interpret([None], paths=[self.source.path]), W_Int32(42),
+        )
+        parser = ExplodingParser(search_path=self.parser().search_path())
+        self.assertEqual(self.interpret(parser=parser), W_Int32(42))
+
+    def test_changed_source(self):
+        self.interpret()
+        self.source.setContent(SOURCE.replace("2", "3"))
+        self.assertEqual(self.interpret(), W_Int32(43))
+
+    def test_changed_search_path(self):
+        other = self.directory.child("other")
+        other.createDirectory()
+        other.child("answer.h").setContent(
+            "int answer(int x) { return x + 50; }\n",
+        )
+        self.assertEqual(
+            (self.interpret(), self.interpret(parser=self.parser(other))),
+            (W_Int32(42), W_Int32(52)),
+        )
+
+    def test_include_found_earlier_in_the_search_path(self):
+        earlier = self.directory.child("earlier")
+        earlier.createDirectory()
+        parser = Parser(
+            preprocessor=preprocessor.with_directories(
+                [earlier.path, self.directory.path],
+            ),
+        )
+        self.interpret(parser=parser)
+        earlier.child("answer.h").setContent(
+            "int answer(int x) { return x + 3; }\n",
+        )
+        self.assertEqual(self.interpret(parser=parser), W_Int32(5))
+
+    def test_cache_path(self):
+        self.assertEqual(
+            (
+                cache.cache_path("a/b/prog.c"),
+                cache.cache_path("prog.c", optimized=True),
+            ),
+            ("a/b/__cycycache__/prog.cycyc", "__cycycache__/prog.opt.cycyc"),
+        )
+
+    def test_changed_include(self):
+        self.interpret()
+        self.header.setContent("int answer(int x) { return x + 50; }\n")
+        self.assertEqual(self.interpret(), W_Int32(52))
+
+    def test_corrupt_cache(self):
+        self.interpret()
+        FilePath(cache.cache_path(self.source.path)).setContent("CYCYC1 junk")
+        self.assertEqual(self.interpret(), W_Int32(42))
+
+    def test_optimized_bytecode_is_cached_separately(self):
+        self.interpret()
+        self.assertFalse(
+            FilePath(
+                cache.cache_path(self.source.path, optimized=True),
+            ).exists(),
+        )
+
+    def test_unwritable_cache_directory(self):
+        self.directory.child(cache.CACHE_DIRECTORY).setContent("not a dir")
+        self.assertEqual(self.interpret(), W_Int32(42))
+
+    def test_file_digest(self):
+        contents = "int x;\n" * 10
+        self.header.setContent(contents)
+        self.assertEqual(
+            cache.file_digest(self.header.path, chunk_size=16),
+            cache.digest(contents),
+        )
+
+    def test_missing_file_digest(self):
+        self.assertIsNone(
+            cache.file_digest(self.directory.child("missing").path),
+        )
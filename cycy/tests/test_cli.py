@@ -1,7 +1,10 @@
 from unittest import TestCase
 
 from cycy import cli
+from cycy.cache import BytecodeCache
+from cycy.compiler import Compiler
 from cycy.interpreter import CyCy
+from cycy.optimizer import Optimizer
 from cycy.parser import preprocessor
 from cycy.parser.core import IncrementalParser, Parser
 
@@ -43,6 +46,55 @@ class TestArgumentParsing(TestCase):
             ),
         )
 
+    def test_optimize(self):
+        self.assertEqual(
+            cli.parse_args(["-O", "file.c"]),
+            cli.CommandLine(
+                action=cli.run_source,
+                source_files=["file.c"],
+                cycy=CyCy(
+                    compiler=Compiler(peephole=True),
+                    parser=IncrementalParser(
+                        parser=Parser(
+                            preprocessor=preprocessor.with_directories([]),
+                        ),
+                    ),
+                    optimizer=Optimizer(),
+                ),
+            ),
+        )
+
+    def test_cache_by_default(self):
+        command_line = cli.parse_args(["file.c"])
+        self.assertEqual(command_line.cycy.cache, BytecodeCache())
+
+    def test_no_cache(self):
+        command_line = cli.parse_args(["--no-cache", "file.c"])
+        self.assertIsNone(command_line.cycy.cache)
+
+    def test_stats(self):
+        command_line = cli.parse_args(["--stats", "file.c"])
+        self.assertTrue(command_line.stats)
+
+    def test_no_stats_by_default(self):
+        command_line = cli.parse_args(["file.c"])
+        self.assertFalse(command_line.stats)
+
+    def test_compile(self):
+        command_line = cli.parse_args(["--compile", "a.c", "b.c"])
+        self.assertEqual(
+            (command_line.action, command_line.source_files),
+            (cli.compile_objects, ["a.c", "b.c"]),
+        )
+
+    def test_compile_without_files(self):
+        self.assertEqual(
+            cli.parse_args(["--compile"]),
+            cli.CommandLine(
+                action=cli.print_help, failure="--compile expects C files",
+            ),
+        )
+
     def test_run_repl(self):
         self.assertEqual(
             cli.parse_args([]),
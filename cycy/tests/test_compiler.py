@@ -30,6 +30,7 @@ class TestCompilerIntegration(TestCase):
             0 LOAD_CONST 1
             2 LOAD_CONST 2
             4 BINARY_NEQ
+            6 POP
             """
         )
 
@@ -49,5 +50,122 @@ class TestCompilerIntegration(TestCase):
             4 LOAD_CONST 2
             6 LOAD_VARIABLE 0
             8 DEREFERENCE
+            10 POP
+            """
+        )
+
+    def test_variables_are_per_function(self):
+        ast = self.parser.parse(
+            source="""
+            int foo(int x) { int y = 1; return x; }
+            int main(void) { int y = 2; return y; }
+            """,
+        )
+        self.compiler.compile(ast)
+        foo = self.compiler.constants[self.compiler.functions["foo"]]
+        main = self.compiler.constants[self.compiler.functions["main"]]
+        self.assertEqual(
+            (foo.bytecode.variables, main.bytecode.variables),
+            (["x", "y"], ["y"]),
+        )
+
+    def test_call_to_a_prototype_is_unresolved(self):
+        ast = self.parser.parse(
+            source="""
+            int twice(int x);
+            int unused(void);
+            int main(void) { return twice(2); }
+            """,
+        )
+        self.compiler.compile(ast)
+        self.assertEqual(self.compiler.unit().undefined(), ["twice"])
+
+    def test_prototype_then_definition(self):
+        ast = self.parser.parse(
+            source="""
+            int twice(int x);
+            int main(void) { return twice(2); }
+            int twice(int x) { return x + x; }
+            """,
+        )
+        self.compiler.compile(ast)
+        self.assertEqual(self.compiler.unit().undefined(), [])
+
+    def test_shadowed_variables_get_their_own_slot(self):
+        self.assertCompiles(
+            "int x = 1; while (x) { int x = 2; x; } x;", """
+            0 LOAD_CONST 1
+            2 STORE_VARIABLE 0
+            4 LOAD_VARIABLE 0
+            6 JUMP_IF_ZERO 18
+            8 LOAD_CONST 2
+            10 STORE_VARIABLE 1
+            12 LOAD_VARIABLE 1
+            14 POP
+            16 JUMP 4
+            18 LOAD_VARIABLE 0
+            20 POP
+            """
+        )
+
+    def test_equal_literals_share_a_constant(self):
+        self.assertCompiles(
+            "0; 'a'; \"a\";\n0; 'a'; \"a\";", """
+            0 LOAD_CONST 1
+            2 POP
+            4 LOAD_CONST 2
+            6 POP
+            8 LOAD_CONST 3
+            10 POP
+            12 LOAD_CONST 1
+            14 POP
+            16 LOAD_CONST 2
+            18 POP
+            20 LOAD_CONST 3
+            22 POP
+            """
+        )
+        self.assertEqual(len(self.compiler.constants), 4)
+
+    def test_comparisons_are_fused_into_loop_conditions(self):
+        self.assertCompiles(
+            "int i = 0; while (i <= 3) { i = i + 1; } while (i != 0) { i; }",
+            """
+            0 LOAD_CONST 1
+            2 STORE_VARIABLE 0
+            4 LOAD_CONST 2
+            6 LOAD_VARIABLE 0
+            8 JUMP_IF_NOT_LEQ 14
+            10 INC_VARIABLE 0
+            12 JUMP 4
+            14 LOAD_CONST 1
+            16 LOAD_VARIABLE 0
+            18 JUMP_IF_EQ 26
+            20 LOAD_VARIABLE 0
+            22 POP
+            24 JUMP 14
+            """
+        )
+
+    def test_superinstructions(self):
+        self.assertCompiles(
+            "int x = 0; int y = 0;"
+            "x = x + 1; y = y - 1; x = y + 2; x = y - x; x = 3 - x;", """
+            0 LOAD_CONST 1
+            2 STORE_VARIABLE 0
+            4 LOAD_CONST 1
+            6 STORE_VARIABLE 1
+            8 INC_VARIABLE 0
+            10 DEC_VARIABLE 1
+            12 LOAD_VARIABLE 1
+            14 ADD_CONST 2
+            16 STORE_VARIABLE 0
+            18 LOAD_VARIABLE 0
+            20 SUB_VARIABLE 1
+            22 STORE_VARIABLE 0
+            24 LOAD_VARIABLE 0
+            26 LOAD_CONST 3
+            28 BINARY_SUB
+            30 STORE_VARIABLE 0
             """
         )
@@ -0,0 +1,148 @@
+from tempfile import mkdtemp
+from unittest import TestCase
+import os
+import shutil
+
+from bp.filepath import FilePath
+
+from cycy import include
+from cycy.interpreter import CyCy
+from cycy.objects import W_Int32
+from cycy.parser.core import Parser
+from cycy.parser.preprocessor import Preprocessor
+from cycy.tests.util import Recorder
+
+
+class TestHeaderCache(TestCase):
+    def setUp(self):
+        self.directory = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory.path)
+        self.header = self.directory.child("header.h")
+        self.header.setContent("int x;")
+
+        self.cache = include.HeaderCache(capacity=2)
+        self.includer = include.DirectoryIncluder(
+            path=self.directory.path, cache=self.cache,
+        )
+        self.parser = Parser()
+
+    def include(self, name="header.h"):
+        return self.includer.include(name=name, parser=self.parser)
+
+    def counters(self):
+        return self.cache.hits, self.cache.misses, self.cache.negative_hits
+
+    def test_repeated_includes_are_cached(self):
+        first = self.include()
+        second = self.include()
+        self.assertEqual(
+            (
+                [token.value for token in second.tokens],
+                second.path,
+                self.counters(),
+            ),
+            (["int", "x", ";"], self.header.path, (1, 1, 0)),
+        )
+        self.assertIs(first, second)
+
+    def test_changed_headers_are_lexed_again(self):
+        self.include()
+        self.header.setContent("int xyz;")
+        included = self.include()
+        self.assertEqual(
+            ([token.value for token in included.tokens], self.counters()),
+            (["int", "xyz", ";"], (0, 2, 0)),
+        )
+
+    def test_changed_modification_time(self):
+        self.include()
+        stat = os.stat(self.header.path)
+        os.utime(self.header.path, (stat.st_atime, stat.st_mtime + 10))
+        self.include()
+        self.assertEqual(self.counters(), (0, 2, 0))
+
+    def test_least_recently_used_is_evicted(self):
+        for name in "abc":
+            self.directory.child(name + ".h").setContent("int x;")
+
+        self.include("a.h")
+        self.include("b.h")
+        self.include("a.h")
+        self.include("c.h")  # evicts b.h
+        self.include("a.h")
+        self.include("b.h")
+        self.assertEqual(self.counters(), (2, 4, 0))
+
+    def test_missing_headers_are_remembered(self):
+        for _ in range(3):
+            with self.assertRaises(include.NotFound):
+                self.include("missing.h")
+        self.assertEqual(self.counters(), (0, 1, 2))
+
+    def test_forgotten_missing_headers_are_looked_for_again(self):
+        with self.assertRaises(include.NotFound):
+            self.include("new.h")
+        self.directory.child("new.h").setContent("int y;")
+        self.includer.forget_missing()
+        included = self.include("new.h")
+        self.assertEqual(
+            ([token.value for token in included.tokens], self.counters()),
+            (["int", "y", ";"], (0, 2, 0)),
+        )
+
+    def test_headers_created_between_programs_are_found(self):
+        stdout = Recorder()
+        cycy = CyCy(
+            parser=Parser(
+                preprocessor=Preprocessor(includers=[self.includer]),
+            ),
+            stdout=stdout,
+        )
+        source = '#include "new.h"\nint main(void) { return y(); }'
+        missing = cycy.interpret([source])
+        self.directory.child("new.h").setContent("int y(void) { return 7; }")
+        found = cycy.interpret([source])
+        self.assertEqual(
+            (missing, "".join(stdout.writes).split("\n")[0], found),
+            (None, "NotFound", W_Int32(7)),
+        )
+
+    def test_missing_headers_are_remembered_across_sources(self):
+        later = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, later.path)
+        later.child("h.h").setContent("int val(void);")
+
+        cycy = CyCy(
+            parser=Parser(
+                preprocessor=Preprocessor(
+                    includers=[
+                        self.includer,
+                        include.DirectoryIncluder(
+                            path=later.path, cache=self.cache,
+                        ),
+                    ],
+                ),
+            ),
+        )
+        cycy.interpret(
+            [
+                '#include "h.h"\nint main(void) { return val(); }',
+                '#include "h.h"\nint val(void) { return 2; }',
+                '#include "h.h"\nint unused(void) { return val(); }',
+            ],
+        )
+        self.assertEqual(self.counters(), (2, 2, 2))
+
+    def test_statistics(self):
+        self.include()
+        self.include()
+        self.assertEqual(
+            self.cache.statistics(),
+            "header cache: 1 hits, 1 misses, 0 known missing",
+        )
+
+    def test_includers_are_equal_whatever_their_cache(self):
+        self.assertEqual(
+            self.includer,
+            include.DirectoryIncluder(path=self.directory.path),
+        )
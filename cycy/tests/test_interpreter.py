@@ -1,8 +1,8 @@
+from StringIO import StringIO
 from unittest import TestCase
-import os
 
-from mock import patch
 from rply.token import Token
+from rpython.rlib import streamio
 
 from cycy import compiler, interpreter
 from cycy.bytecode import (
@@ -12,7 +12,10 @@ from cycy.bytecode import (
     BINARY_SUB,
     CALL,
     DEREFERENCE,
+    DUP,
     JUMP,
+    JUMP_IF_EQ,
+    JUMP_IF_NOT_LEQ,
     JUMP_IF_NOT_ZERO,
     JUMP_IF_ZERO,
     LOAD_CONST,
@@ -25,6 +28,7 @@ from cycy.bytecode import (
 )
 from cycy.objects import W_Bool, W_Char, W_Function, W_Int32, W_String
 from cycy.parser.core import ParseError
+from cycy.tests.util import Recorder
 
 
 class TestInterpreter(TestCase):
@@ -32,6 +36,24 @@ class TestInterpreter(TestCase):
 
 
 class TestInterpreterWithBytecode(TestCase):
+    def test_printable_location(self):
+        byte_code = Bytecode(
+            tape=compiler.Tape(
+                instructions=[
+                    LOAD_CONST, 0,
+                    RETURN, 1,
+                ]
+            ),
+            constants=[W_Int32(0)],
+            name="main",
+            arguments=(),
+            variables=[],
+        )
+        self.assertEqual(
+            interpreter.get_printable_location(2, byte_code),
+            "main:2 RETURN",
+        )
+
     def test_it_handles_opcodes_with_args(self):
         byte_code = Bytecode(
             tape=compiler.Tape(
@@ -44,16 +66,12 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Char("x")],
             name="<some test bytecode>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
-        with patch.object(os, "write") as os_write:
-            interpreter.CyCy().run(byte_code)
-
-            os_write.assert_called_once_with(
-                1,  # file descriptor for stdout
-                "x",
-            )
+        stdout = StringIO()
+        interpreter.CyCy(stdout=stdout).run(byte_code)
+        self.assertEqual(stdout.getvalue(), "x")
 
     def test_it_can_return_no_value(self):
         # this is not the same as a C function returning NULL,
@@ -63,7 +81,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[],
             name="<some test bytecode>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -80,7 +98,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0)],
             name="<test_load_const>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -99,7 +117,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0), W_Int32(1)],
             name="<test_binary_neq>",
             arguments=(),
-            variables={},
+            variables=[],
         )
         byte_code_eq = Bytecode(
             tape=compiler.Tape(
@@ -113,7 +131,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0)],
             name="<test_binary_neq>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code_ne)
@@ -135,7 +153,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(1), W_Int32(0)],
             name="<test_binary_neq>",
             arguments=(),
-            variables={},
+            variables=[],
         )
         byte_code_leq = Bytecode(
             tape=compiler.Tape(
@@ -149,7 +167,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0)],
             name="<test_binary_neq>",
             arguments=(),
-            variables={},
+            variables=[],
         )
         byte_code_gt = Bytecode(
             tape=compiler.Tape(
@@ -163,7 +181,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0), W_Int32(1)],
             name="<test_binary_neq>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code_lt)
@@ -175,6 +193,63 @@ class TestInterpreterWithBytecode(TestCase):
         rv = interpreter.CyCy().run(byte_code_gt)
         self.assertEqual(rv, W_Bool(False))
 
+    def test_jump_if_not_leq(self):
+        def byte_code(left, right):
+            return Bytecode(
+                tape=compiler.Tape(
+                    instructions=[
+                        LOAD_CONST, right,
+                        LOAD_CONST, left,
+                        JUMP_IF_NOT_LEQ, 10,
+                        LOAD_CONST, 1,
+                        RETURN, 1,
+                        LOAD_CONST, 0,
+                        RETURN, 1,
+                    ]
+                ),
+                constants=[W_Int32(0), W_Int32(1)],
+                name="<test_jump_if_not_leq>",
+                arguments=(),
+                variables=[],
+            )
+
+        self.assertEqual(
+            [
+                interpreter.CyCy().run(byte_code(left=0, right=1)),
+                interpreter.CyCy().run(byte_code(left=0, right=0)),
+                interpreter.CyCy().run(byte_code(left=1, right=0)),
+            ],
+            [W_Int32(1), W_Int32(1), W_Int32(0)],
+        )
+
+    def test_jump_if_eq(self):
+        def byte_code(left, right):
+            return Bytecode(
+                tape=compiler.Tape(
+                    instructions=[
+                        LOAD_CONST, right,
+                        LOAD_CONST, left,
+                        JUMP_IF_EQ, 10,
+                        LOAD_CONST, 1,
+                        RETURN, 1,
+                        LOAD_CONST, 0,
+                        RETURN, 1,
+                    ]
+                ),
+                constants=[W_Int32(0), W_Int32(1)],
+                name="<test_jump_if_eq>",
+                arguments=(),
+                variables=[],
+            )
+
+        self.assertEqual(
+            [
+                interpreter.CyCy().run(byte_code(left=0, right=1)),
+                interpreter.CyCy().run(byte_code(left=1, right=1)),
+            ],
+            [W_Int32(1), W_Int32(0)],
+        )
+
     def test_binary_add(self):
         byte_code = Bytecode(
             tape=compiler.Tape(
@@ -188,7 +263,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(1), W_Int32(2)],
             name="<test_binary_add>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -207,7 +282,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(1), W_Int32(2)],
             name="<test_binary_add>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -226,12 +301,31 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(1)],
             name="<test_binary_add>",
             arguments=(),
-            variables={"x": 0},
+            variables=["x"],
         )
 
         rv = interpreter.CyCy().run(byte_code)
         self.assertEqual(rv, W_Int32(1))
 
+    def test_dup(self):
+        byte_code = Bytecode(
+            tape=compiler.Tape(
+                instructions=[
+                    LOAD_CONST, 0,
+                    DUP, NO_ARG,
+                    BINARY_ADD, NO_ARG,
+                    RETURN, 1,
+                ]
+            ),
+            constants=[W_Int32(21)],
+            name="<test_dup>",
+            arguments=(),
+            variables=[],
+        )
+
+        rv = interpreter.CyCy().run(byte_code)
+        self.assertEqual(rv, W_Int32(42))
+
     def test_it_calls_a_function_with_no_args(self):
         byte_code = Bytecode(
             tape=compiler.Tape(
@@ -247,7 +341,7 @@ class TestInterpreterWithBytecode(TestCase):
                     bytecode=Bytecode(
                         name="<the callee's bytecode>",
                         arguments=(),
-                        variables={},
+                        variables=[],
                         constants=[W_Int32(42)],
                         tape=compiler.Tape(
                             instructions=[
@@ -260,7 +354,7 @@ class TestInterpreterWithBytecode(TestCase):
             ],
             name="<test_calls_a_function_with_no_args>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -282,7 +376,7 @@ class TestInterpreterWithBytecode(TestCase):
                     bytecode=Bytecode(
                         name="<the callee's bytecode>",
                         arguments=["x"],
-                        variables={"x": 0},
+                        variables=["x"],
                         constants=[W_Int32(42)],
                         tape=compiler.Tape(
                             instructions=[
@@ -295,7 +389,7 @@ class TestInterpreterWithBytecode(TestCase):
             ],
             name="<test_calls_a_function_with_no_args>",
             arguments=(),
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -316,7 +410,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_String("bar"), W_Int32(1)],
             name="<test_array_dereferences>",
             arguments=[],
-            variables={"foo": ""},
+            variables=["foo"],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -335,7 +429,7 @@ class TestInterpreterWithBytecode(TestCase):
             constants=[W_Int32(0), W_Int32(1)],
             name="<test_array_dereferences>",
             arguments=[],
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -346,16 +440,17 @@ class TestInterpreterWithBytecode(TestCase):
             tape=compiler.Tape(
                 instructions=[
                     LOAD_CONST, 1,
-                    LOAD_CONST, 1,
-                    JUMP_IF_NOT_ZERO, 8,   # jump to just past LOAD_CONST 0
+                    JUMP_IF_NOT_ZERO, 8,   # jump to just past RETURN 1
                     LOAD_CONST, 0,
                     RETURN, 1,
+                    LOAD_CONST, 1,
+                    RETURN, 1,
                 ]
             ),
             constants=[W_Int32(0), W_Int32(1)],
             name="<test_array_dereferences>",
             arguments=[],
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -366,16 +461,17 @@ class TestInterpreterWithBytecode(TestCase):
             tape=compiler.Tape(
                 instructions=[
                     LOAD_CONST, 0,
-                    LOAD_CONST, 0,
-                    JUMP_IF_ZERO, 8,   # jump to just past LOAD_CONST 0
+                    JUMP_IF_ZERO, 8,   # jump to just past RETURN 1
                     LOAD_CONST, 1,
                     RETURN, 1,
+                    LOAD_CONST, 0,
+                    RETURN, 1,
                 ]
             ),
             constants=[W_Int32(0), W_Int32(1)],
             name="<test_array_dereferences>",
             arguments=[],
-            variables={},
+            variables=[],
         )
 
         rv = interpreter.CyCy().run(byte_code)
@@ -411,11 +507,99 @@ class TestInterpreterWithC(TestCase):
         rv = self.interpreter.run(byte_code_gt)
         self.assertEqual(rv, W_Bool(False))
 
+    def test_superinstructions(self):
+        byte_code = self.get_bytecode(
+            "int main(void) {"
+            "  int x = 10; int y = 4;"
+            "  x = x + 1; y = y - 1;"     # 11, 3
+            "  x = x - y;"                # 8
+            "  y = y + x;"                # 11
+            "  x = x - 2;"                # 6
+            "  return x + y;"             # 17
+            "}"
+        )
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(17))
+
     def test_binary_sub(self):
         byte_code = self.get_bytecode("int main(void) { return 7 - 3; }")
         rv = self.interpreter.run(byte_code)
         self.assertEqual(rv, W_Int32(4))
 
+    def test_char_comparison(self):
+        byte_code = self.get_bytecode(
+            "int main(void) {"
+            "  const char* foo = \"foo\";"
+            "  return foo[1] != 'o';"
+            "}"
+        )
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Bool(False))
+
+    def test_call_with_computed_argument(self):
+        byte_code = self.get_bytecode(
+            "int twice(int x) { return x + x; }"
+            "int main(void) {"
+            "  int y = 2;"
+            "  return twice(y + 1) - 1;"
+            "}"
+        )
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(5))
+
+    def test_discarded_values_in_a_loop(self):
+        byte_code = self.get_bytecode(
+            "int one(void) { return 1; }"
+            "int main(void) {"
+            "  int i = 100;"
+            "  while (i) {"
+            "    one();"
+            "    i - 1;"
+            "    i = i - 1;"
+            "  }"
+            "  return i;"
+            "}"
+        )
+
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(0))
+
+    def test_shadowed_variable(self):
+        byte_code = self.get_bytecode(
+            "int main(void) {"
+            "  int x = 5;"
+            "  int i = 1;"
+            "  while (i) {"
+            "    int x = 2;"
+            "    i = i - 1;"
+            "  }"
+            "  return x;"
+            "}"
+        )
+
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(5))
+
+    def test_call_with_multiple_arguments(self):
+        byte_code = self.get_bytecode(
+            "int sub(int a, int b) { return a - b; }"
+            "int main(void) { return sub(7, 3); }"
+        )
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(4))
+
+    def test_deep_recursion(self):
+        # far deeper than the host's recursion limit
+        byte_code = self.get_bytecode(
+            "int down(int n) {"
+            "  while (n) { return down(n - 1) + 1; }"
+            "  return 0;"
+            "}"
+            "int main(void) { return down(20000); }"
+        )
+        rv = self.interpreter.run(byte_code)
+        self.assertEqual(rv, W_Int32(20000))
+
     def test_while_loop(self):
         byte_code = self.get_bytecode(
             "int main(void) {"
@@ -434,12 +618,72 @@ class TestInterpreterWithC(TestCase):
 
 
 class TestInterpreterIntegration(TestCase):
+    def test_output_is_buffered_until_exit(self):
+        recorder = Recorder()
+        cycy = interpreter.CyCy(
+            stdout=streamio.BufferingOutputStream(recorder),
+        )
+        cycy.interpret(
+            [
+                """
+                int main(void) {
+                    putchar('h');
+                    putchar('i');
+                    putchar('\\n');
+                    return 0;
+                }
+                """,
+            ],
+        )
+        self.assertEqual(recorder.writes, ["hi\n"])
+
+    def test_output_is_line_buffered(self):
+        recorder = Recorder()
+        cycy = interpreter.CyCy(
+            stdout=streamio.LineBufferingOutputStream(recorder),
+        )
+        byte_code = Bytecode(
+            tape=compiler.Tape(
+                instructions=[
+                    LOAD_CONST, 0,
+                    PUTC, NO_ARG,
+                    LOAD_CONST, 1,
+                    PUTC, NO_ARG,
+                    LOAD_CONST, 0,
+                    PUTC, NO_ARG,
+                    RETURN, 0,
+                ]
+            ),
+            constants=[W_Char("x"), W_Char("\n")],
+            name="<test_output_is_line_buffered>",
+            arguments=(),
+            variables=[],
+        )
+        cycy.run(byte_code)
+        self.assertEqual(recorder.writes, ["x\n"])
+
+        cycy.flush()
+        self.assertEqual(recorder.writes, ["x\n", "x"])
+
     def test_unknown_function_call(self):
         errors = []
         cycy = interpreter.CyCy(handle_error=errors.append)
         cycy.interpret(["int main(void) { return canhazprint(0); }"])
         self.assertEqual(errors, [compiler.NoSuchFunction("canhazprint")])
 
+    def test_max_call_depth(self):
+        errors = []
+        cycy = interpreter.CyCy(handle_error=errors.append, max_call_depth=10)
+        cycy.interpret(
+            [
+                """
+                int deeper(int n) { return deeper(n + 1); }
+                int main(void) { return deeper(0); }
+                """,
+            ],
+        )
+        self.assertEqual(errors, [interpreter.CallDepthExceeded(depth=10)])
+
     def test_parse_error(self):
         errors = []
         cycy = interpreter.CyCy(handle_error=errors.append)
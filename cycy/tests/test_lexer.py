@@ -0,0 +1,272 @@
+from tempfile import mkdtemp
+from unittest import TestCase
+import os
+import shutil
+
+from rply.errors import LexingError
+from rply.token import Token
+
+from cycy.parser.lexer import LineIndex, TYPES, TokenList, lexer, regex_lexer
+from cycy.tests.util import Input
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+def tokens(lexer, source):
+    return described(lexer.lex(source))
+
+
+def described(tokens):
+    return [
+        (
+            token.name,
+            token.value,
+            token.getsourcepos().idx,
+            token.getsourcepos().lineno,
+            token.getsourcepos().colno,
+        ) for token in tokens
+    ]
+
+
+def streamed(source, chunk_size):
+    return described(lexer.lex_stream(Input(source), chunk_size=chunk_size))
+
+
+class TestLexer(TestCase):
+    def assertLexes(self, source, to):
+        self.assertEqual(
+            [(token.name, token.value) for token in lexer.lex(source)], to,
+        )
+
+    def test_same_tokens_as_the_regex_lexer(self):
+        for directory in ["benchmarks", "include/cycy", "lib/cycy"]:
+            path = os.path.join(ROOT, directory)
+            for name in os.listdir(path):
+                if name.endswith((".c", ".h")):
+                    with open(os.path.join(path, name)) as file:
+                        source = file.read()
+                    self.assertEqual(
+                        tokens(lexer, source), tokens(regex_lexer, source),
+                        name,
+                    )
+
+    def test_operators(self):
+        source = "++ + -- - == = != <= < >= > && || ; , * / %"
+        self.assertEqual(
+            tokens(lexer, source), tokens(regex_lexer, source),
+        )
+
+    def test_literals(self):
+        self.assertLexes(
+            "1 2.5 'x' '\\n' \"a\\\"b\"",
+            [
+                ("INTEGER_LITERAL", "1"),
+                ("FLOAT_LITERAL", "2.5"),
+                ("CHAR_LITERAL", "'x'"),
+                ("CHAR_LITERAL", "'\\n'"),
+                ("STRING_LITERAL", '"a\\"b"'),
+            ],
+        )
+
+    def test_keywords_are_whole_identifiers(self):
+        self.assertLexes(
+            "int integer_count returned asm",
+            [
+                ("INT", "int"),
+                ("IDENTIFIER", "integer_count"),
+                ("IDENTIFIER", "returned"),
+                ("ASM", "asm"),
+            ],
+        )
+
+    def test_string_literals_are_not_greedy(self):
+        self.assertLexes(
+            '"a", "b"',
+            [
+                ("STRING_LITERAL", '"a"'),
+                (",", ","),
+                ("STRING_LITERAL", '"b"'),
+            ],
+        )
+
+    def test_source_positions(self):
+        source = "int\n  main"
+        self.assertEqual(
+            tokens(lexer, source), [
+                ("INT", "int", 0, 1, 1),
+                ("IDENTIFIER", "main", 6, 2, 3),
+            ],
+        )
+
+    def test_pragma(self):
+        self.assertLexes(
+            "#pragma once\nint",
+            [("PRAGMA", "#pragma once"), ("INT", "int")],
+        )
+
+    def test_unknown_character(self):
+        with self.assertRaises(LexingError) as e:
+            list(lexer.lex("int @"))
+        self.assertEqual(e.exception.source_pos.idx, 4)
+
+    def test_error_line_and_column(self):
+        with self.assertRaises(LexingError) as e:
+            list(lexer.lex("int x;\n  @"))
+        position = e.exception.getsourcepos()
+        self.assertEqual(
+            (position.idx, position.lineno, position.colno), (9, 2, 3),
+        )
+
+    def test_unterminated_string(self):
+        with self.assertRaises(LexingError):
+            list(lexer.lex('"abc\n"'))
+
+    def test_tokens(self):
+        self.assertEqual(
+            list(lexer.lex("x;")), [Token("IDENTIFIER", "x"), Token(";", ";")],
+        )
+
+
+class TestStreamingLexer(TestCase):
+    def test_same_tokens_as_lexing_a_string(self):
+        path = os.path.join(ROOT, "benchmarks", "fib.c")
+        with open(path) as file:
+            source = file.read()
+        for chunk_size in [1, 2, 3, 7, 64, 100000]:
+            self.assertEqual(
+                streamed(source, chunk_size), tokens(lexer, source),
+                chunk_size,
+            )
+
+    def test_tokens_across_chunk_boundaries(self):
+        source = 'int identifier = 12345;\n  puts("a string");\n#pragma once'
+        for chunk_size in xrange(1, len(source) + 1):
+            self.assertEqual(
+                streamed(source, chunk_size), tokens(lexer, source),
+                chunk_size,
+            )
+
+    def test_blank_chunks(self):
+        source = "\n\n\n      \n\n  x\n\n\n"
+        self.assertEqual(streamed(source, 2), tokens(lexer, source))
+
+    def test_empty(self):
+        self.assertEqual(streamed("", 4), [])
+
+    def test_reads_in_chunks(self):
+        stream = Input("int x;\n" * 100)
+        list(lexer.lex_stream(stream, chunk_size=16))
+        self.assertEqual(max(len(read) for read in stream.reads), 16)
+
+    def test_error_position(self):
+        with self.assertRaises(LexingError) as e:
+            list(lexer.lex_stream(Input("int x;\nint @"), chunk_size=3))
+        self.assertEqual(e.exception.source_pos.idx, 11)
+
+
+class TestLexingFiles(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def lexed(self, source):
+        path = os.path.join(self.directory, "source.c")
+        with open(path, "w") as file:
+            file.write(source)
+        return described(lexer.lex_mapped(path, chunk_size=3))
+
+    def test_same_tokens_as_lexing_a_string(self):
+        source = 'int main(void) {\n    return puts("hi");\n}\n'
+        self.assertEqual(self.lexed(source), tokens(lexer, source))
+
+    def test_no_trailing_newline(self):
+        self.assertEqual(self.lexed("int\nx"), tokens(lexer, "int\nx"))
+
+    def test_empty(self):
+        self.assertEqual(self.lexed(""), [])
+
+    def test_missing(self):
+        with self.assertRaises(OSError):
+            lexer.lex_mapped(os.path.join(self.directory, "missing.c"))
+
+    def test_compact_token_text_is_read_when_needed(self):
+        path = os.path.join(self.directory, "source.c")
+        with open(path, "w") as file:
+            file.write("int\nanswer = 42;")
+        compact = lexer.lex_mapped(path, chunk_size=3).compact()
+        self.assertEqual(compact.values, ["int", None, "=", None, ";"])
+        self.assertEqual(
+            described(compact), tokens(lexer, "int\nanswer = 42;"),
+        )
+
+    def test_lex_file(self):
+        path = os.path.join(self.directory, "source.c")
+        with open(path, "w") as file:
+            file.write("int\nx;")
+        self.assertEqual(
+            described(lexer.lex_file(path, chunk_size=3)),
+            tokens(lexer, "int\nx;"),
+        )
+
+
+class TestLineIndex(TestCase):
+    def test_positions(self):
+        lines = LineIndex()
+        lines.add(4)
+        lines.add(5)
+        lines.add(10)
+        self.assertEqual(
+            [
+                (position.lineno, position.colno)
+                for position in [
+                    lines.position(offset) for offset in [0, 3, 4, 5, 9, 12]
+                ]
+            ],
+            [(1, 1), (1, 4), (2, 1), (3, 1), (3, 5), (4, 3)],
+        )
+
+
+class TestTokenList(TestCase):
+    def test_same_tokens_as_lexing(self):
+        path = os.path.join(ROOT, "benchmarks", "fib.c")
+        with open(path) as file:
+            source = file.read()
+        self.assertEqual(
+            described(lexer.lex(source).compact()), tokens(lexer, source),
+        )
+
+    def test_types_are_indices(self):
+        compact = lexer.lex("int x;").compact()
+        self.assertEqual(
+            [TYPES[type_id] for type_id in compact.types],
+            ["INT", "IDENTIFIER", ";"],
+        )
+
+    def test_offsets(self):
+        compact = lexer.lex("int\n  x;").compact()
+        self.assertEqual(compact.offsets, [0, 6, 7])
+
+    def test_empty(self):
+        self.assertEqual(list(TokenList()), [])
+
+    def test_iterated_more_than_once(self):
+        compact = lexer.lex("x;").compact()
+        self.assertEqual(list(compact), list(compact))
+
+    def test_lazy(self):
+        compact = lexer.lex("int x; 'x").compact(lazy=True)
+        self.assertEqual(compact.types, [])
+        tokens = iter(compact)
+        self.assertEqual(next(tokens).name, "INT")
+        self.assertEqual(len(compact.types), 1)
+        self.assertEqual(next(tokens).name, "IDENTIFIER")
+        self.assertEqual(next(tokens).name, ";")
+        with self.assertRaises(LexingError):
+            next(tokens)
+
+    def test_lazy_same_tokens_as_lexing(self):
+        source = "int main(void) {\n    return 0;\n}\n"
+        compact = lexer.lex(source).compact(lazy=True)
+        self.assertEqual(described(compact), tokens(lexer, source))
+        self.assertEqual(described(compact), tokens(lexer, source))
@@ -0,0 +1,97 @@
+from tempfile import mkdtemp
+from unittest import TestCase
+import shutil
+
+from bp.filepath import FilePath
+
+from cycy import linker, objectfile
+from cycy.compiler import Compiler
+from cycy.interpreter import CyCy
+from cycy.objects import W_Int32
+from cycy.parser.core import Parser
+
+
+def compiled(source):
+    compiler = Compiler()
+    compiler.compile(Parser().parse(source=source))
+    return compiler.unit()
+
+
+MAIN = """
+int twice(int x);
+int main(void) { return twice(21); }
+"""
+TWICE = "int twice(int x) { return x + x; }"
+
+
+class TestLink(TestCase):
+    def test_calls_between_units(self):
+        symbols = linker.link([compiled(MAIN), compiled(TWICE)])
+        w_main = symbols["main"]
+        self.assertEqual(
+            w_main.call(arguments=[], interpreter=CyCy()), W_Int32(42),
+        )
+
+    def test_unresolved(self):
+        with self.assertRaises(linker.UnresolvedSymbol) as e:
+            linker.link([compiled(MAIN)])
+        self.assertEqual(e.exception, linker.UnresolvedSymbol(name="twice"))
+
+    def test_duplicate(self):
+        with self.assertRaises(linker.DuplicateSymbol) as e:
+            linker.link([compiled(MAIN), compiled(TWICE), compiled(TWICE)])
+        self.assertEqual(e.exception, linker.DuplicateSymbol(name="twice"))
+
+    def test_conflicting_declaration(self):
+        with self.assertRaises(linker.ConflictingDeclaration):
+            linker.link(
+                [compiled(MAIN), compiled("int twice(void) { return 2; }")],
+            )
+
+
+class TestObjectFiles(TestCase):
+    def setUp(self):
+        self.directory = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory.path)
+
+    def test_object_path(self):
+        self.assertEqual(objectfile.object_path("a/prog.c"), "a/prog.cyo")
+
+    def test_round_trip(self):
+        main = self.directory.child("main.cyo").path
+        twice = self.directory.child("twice.cyo").path
+        objectfile.write_object(main, compiled(MAIN))
+        objectfile.write_object(twice, compiled(TWICE))
+
+        units = [objectfile.read_object(main), objectfile.read_object(twice)]
+        self.assertEqual(units[0].undefined(), ["twice"])
+        w_main = linker.link(units)["main"]
+        self.assertEqual(
+            w_main.call(arguments=[], interpreter=CyCy()), W_Int32(42),
+        )
+
+    def test_invalid(self):
+        path = self.directory.child("junk.cyo")
+        path.setContent("junk")
+        with self.assertRaises(objectfile.InvalidObjectFile):
+            objectfile.read_object(path.path)
+
+
+class TestInterpretLinked(TestCase):
+    def test_sources(self):
+        self.assertEqual(CyCy().interpret([MAIN, TWICE]), W_Int32(42))
+
+    def test_sources_and_objects(self):
+        directory = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, directory.path)
+        twice = directory.child("twice.cyo").path
+        objectfile.write_object(twice, compiled(TWICE))
+
+        self.assertEqual(
+            CyCy().interpret([MAIN], objects=[twice]), W_Int32(42),
+        )
+
+    def test_missing_main(self):
+        errors = []
+        CyCy(handle_error=errors.append).interpret([TWICE])
+        self.assertEqual(errors, [linker.UnresolvedSymbol(name="main")])
@@ -0,0 +1,119 @@
+from unittest import TestCase
+
+from cycy.optimizer import Optimizer
+from cycy.parser.ast import (
+    BinaryOperation,
+    Block,
+    Call,
+    Char,
+    For,
+    Function,
+    If,
+    Int32,
+    Program,
+    ReturnStatement,
+    Type,
+    Variable,
+)
+
+
+class TestOptimizer(TestCase):
+    def setUp(self):
+        self.optimizer = Optimizer()
+
+    def function_wrap_node(self, *statements):
+        return Program([
+            Function(
+                return_type=Type(base="int"),
+                name="main",
+                params=[],
+                body=Block(list(statements)),
+            ),
+        ])
+
+    def assertOptimizes(self, statements, to, folded):
+        optimized = self.optimizer.optimize(self.function_wrap_node(*statements))
+        self.assertEqual(
+            (optimized, self.optimizer.folded),
+            (self.function_wrap_node(*to), folded),
+        )
+
+    def test_constant_arithmetic(self):
+        self.assertOptimizes(
+            [
+                ReturnStatement(
+                    value=BinaryOperation(
+                        operator="-",
+                        left=BinaryOperation(
+                            operator="+", left=Int32(2), right=Int32(3),
+                        ),
+                        right=Char("a"),
+                    ),
+                ),
+            ],
+            to=[ReturnStatement(value=Int32(5 - 97))],
+            folded=2,
+        )
+
+    def test_constant_comparisons(self):
+        self.assertOptimizes(
+            [
+                BinaryOperation(operator="!=", left=Int32(2), right=Int32(3)),
+                BinaryOperation(operator="<=", left=Int32(4), right=Int32(3)),
+            ],
+            to=[Int32(1), Int32(0)],
+            folded=2,
+        )
+
+    def test_unsupported_operators_are_not_folded(self):
+        multiply = BinaryOperation(operator="*", left=Int32(2), right=Int32(3))
+        self.assertOptimizes([multiply], to=[multiply], folded=0)
+
+    def test_identities(self):
+        self.assertOptimizes(
+            [
+                BinaryOperation(operator="+", left=Variable("x"), right=Int32(0)),
+                BinaryOperation(operator="-", left=Variable("x"), right=Int32(0)),
+                BinaryOperation(operator="+", left=Int32(0), right=Variable("x")),
+            ],
+            to=[Variable("x"), Variable("x"), Variable("x")],
+            folded=3,
+        )
+
+    def test_identities_keep_non_integer_operands(self):
+        # Adding 0 to a call may change a char it returns into an int.
+        plus_zero = BinaryOperation(
+            operator="+", left=Call(name="foo", args=[]), right=Int32(0),
+        )
+        self.assertOptimizes([plus_zero], to=[plus_zero], folded=0)
+
+    def test_while_false_is_removed(self):
+        self.assertOptimizes(
+            [
+                For(
+                    condition=BinaryOperation(
+                        operator="<=", left=Int32(2), right=Int32(1),
+                    ),
+                    body=Block([Call(name="foo", args=[])]),
+                ),
+            ],
+            to=[],
+            folded=2,
+        )
+
+    def test_while_true_has_no_condition(self):
+        self.assertOptimizes(
+            [For(condition=Int32(1), body=Block([ReturnStatement(Int32(0))]))],
+            to=[For(body=Block([ReturnStatement(Int32(0))]))],
+            folded=1,
+        )
+
+    def test_constant_ifs(self):
+        self.assertOptimizes(
+            [
+                If(condition=Int32(0), body=Block([Call(name="foo", args=[])])),
+                If(condition=Int32(1), body=Block([Call(name="bar", args=[])])),
+            ],
+            to=[Block([Call(name="bar", args=[])])],
+            folded=2,
+        )
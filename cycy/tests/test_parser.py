@@ -1,5 +1,9 @@
+from tempfile import mkdtemp
 from textwrap import dedent
 from unittest import TestCase
+import shutil
+
+from bp.filepath import FilePath
 
 from cycy.parser.ast import (
     ArrayDereference,
@@ -25,7 +29,9 @@ from cycy.parser.ast import (
     For,
     Type,
 )
-from cycy.parser.core import ParseError, Parser
+from cycy.parser.core import IncrementalParser, ParseError, Parser
+from cycy.parser.lexer import TokenList
+from cycy.parser.preprocessor import Preprocessor
 
 
 class TestParser(TestCase):
@@ -466,6 +472,21 @@ class TestParser(TestCase):
             )
         )
 
+    def test_function_call_with_multiple_arguments(self):
+        self.assertEqual(
+            self.parse(self.function_wrap("foo(a, 1, bar(b));")),
+            self.function_wrap_node(
+                Call(
+                    name="foo",
+                    args=[
+                        Variable(name="a"),
+                        Int32(value=1),
+                        Call(name="bar", args=[Variable(name="b")]),
+                    ],
+                )
+            )
+        )
+
     def test_function_call_without_arguments(self):
         self.assertEqual(
             self.parse(self.function_wrap("putc();")),
@@ -783,3 +804,103 @@ class TestParser(TestCase):
             "^\n"
             "Unexpected IDENTIFIER 'One' at line 2, column 1",
         )
+
+
+class RecordingPreprocessor(Preprocessor):
+    def preprocessed(self, tokens, parser):
+        self.tokens = tokens
+        return Preprocessor.preprocessed(self, tokens=tokens, parser=parser)
+
+
+class TestTokenList(TestCase):
+    def test_parser_consumes_a_token_list(self):
+        preprocessor = RecordingPreprocessor()
+        parser = Parser(preprocessor=preprocessor)
+        parser.parse("int f(void) { return 0; }")
+        self.assertIsInstance(preprocessor.tokens, TokenList)
+        self.assertEqual(len(preprocessor.tokens.types), 10)
+
+    def test_error_position(self):
+        with self.assertRaises(ParseError) as e:
+            Parser().parse("int main(void) {\n  return 0 0;\n}\n")
+        position = e.exception.token.getsourcepos()
+        self.assertEqual((position.lineno, position.colno), (2, 12))
+
+
+class TestParseFile(TestCase):
+    def setUp(self):
+        self.directory = FilePath(mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory.path)
+        self.source = self.directory.child("prog.c")
+
+    def test_parse_file(self):
+        source = "int main(void) {\n    return 0;\n}\n"
+        self.source.setContent(source)
+        self.assertEqual(
+            Parser().parse_file(self.source.path), Parser().parse(source),
+        )
+
+    def test_errors_are_shown_in_context(self):
+        self.source.setContent("int main(void) {\n    return 0 0;\n}\n")
+        with self.assertRaises(ParseError) as e:
+            Parser().parse_file(self.source.path)
+        self.assertEqual(
+            str(e.exception),
+            "    return 0 0;\n"
+            "             ^\n"
+            "Unexpected INTEGER_LITERAL '0' at line 2, column 14",
+        )
+
+    def test_incomplete_file(self):
+        self.source.setContent("int main(void) {\n")
+        self.assertIsNone(IncrementalParser().parse_file(self.source.path))
+
+
+class CountingParser(Parser):
+    """
+    A parser which records how much source it has been asked to parse.
+
+    """
+
+    def __init__(self):
+        Parser.__init__(self)
+        self.parsed = []
+
+    def parse(self, source):
+        self.parsed.append(len(source))
+        return Parser.parse(self, source)
+
+
+class TestIncrementalParser(TestCase):
+    def setUp(self):
+        self.counting = CountingParser()
+        self.parser = IncrementalParser(parser=self.counting)
+
+    def test_pasting_a_large_function(self):
+        lines = ["int main(void) {\n"]
+        lines.extend("    int x%s = %s;\n" % (i, i) for i in range(500))
+        lines.append("    return 0;\n")
+        lines.append("}\n")
+
+        results = [self.parser.parse(line) for line in lines]
+
+        self.assertEqual(
+            (results[:-1], self.counting.parsed),
+            ([None] * (len(lines) - 1), [len("".join(lines))]),
+        )
+        self.assertEqual(len(results[-1].units[0].body.statements), 501)
+        self.assertFalse(self.parser.input_in_progress)
+
+    def test_balanced_but_incomplete_input(self):
+        self.assertIsNone(self.parser.parse("int main(void)\n"))
+        self.assertTrue(self.parser.input_in_progress)
+        program = self.parser.parse("{ return 0; }\n")
+        self.assertEqual(len(program.units), 1)
+
+    def test_errors_reset_the_buffer(self):
+        self.parser.parse("int main(void) {\n")
+        with self.assertRaises(ParseError):
+            self.parser.parse("}}\n")
+        self.assertFalse(self.parser.input_in_progress)
+        program = self.parser.parse("int f(void) { return 1; }\n")
+        self.assertEqual(len(program.units), 1)
@@ -0,0 +1,113 @@
+from unittest import TestCase
+
+from cycy import peephole
+from cycy.bytecode import (
+    DUP,
+    JUMP,
+    JUMP_IF_ZERO,
+    LOAD_CONST,
+    LOAD_VARIABLE,
+    NO_ARG,
+    POP,
+    RETURN,
+    STORE_VARIABLE,
+)
+from cycy.compiler import Compiler, Tape
+from cycy.parser.core import Parser
+
+
+class TestPeephole(TestCase):
+    def assertOptimizes(self, instructions, to):
+        self.assertEqual(
+            peephole.optimized(Tape(instructions=instructions)), to,
+        )
+
+    def test_jump_threading(self):
+        self.assertOptimizes(
+            [
+                LOAD_VARIABLE, 0,
+                JUMP_IF_ZERO, 6,
+                RETURN, 0,
+                JUMP, 8,
+                LOAD_CONST, 0,
+                RETURN, 1,
+            ],
+            to=[
+                LOAD_VARIABLE, 0,
+                JUMP_IF_ZERO, 6,
+                RETURN, 0,
+                LOAD_CONST, 0,
+                RETURN, 1,
+            ],
+        )
+
+    def test_unreachable_code_is_removed(self):
+        self.assertOptimizes(
+            [
+                LOAD_CONST, 0,
+                RETURN, 1,
+                LOAD_CONST, 1,
+                POP, NO_ARG,
+            ],
+            to=[
+                LOAD_CONST, 0,
+                RETURN, 1,
+            ],
+        )
+
+    def test_jump_to_next_instruction_is_removed(self):
+        self.assertOptimizes(
+            [
+                JUMP, 2,
+                LOAD_CONST, 0,
+                RETURN, 1,
+            ],
+            to=[
+                LOAD_CONST, 0,
+                RETURN, 1,
+            ],
+        )
+
+    def test_store_load_forwarding(self):
+        self.assertOptimizes(
+            [
+                LOAD_CONST, 0,
+                STORE_VARIABLE, 0,
+                LOAD_VARIABLE, 0,
+                RETURN, 1,
+            ],
+            to=[
+                LOAD_CONST, 0,
+                DUP, NO_ARG,
+                STORE_VARIABLE, 0,
+                RETURN, 1,
+            ],
+        )
+
+    def test_no_forwarding_to_a_jump_target(self):
+        instructions = [
+            LOAD_CONST, 0,
+            STORE_VARIABLE, 0,
+            LOAD_VARIABLE, 0,
+            JUMP_IF_ZERO, 4,
+            RETURN, 0,
+        ]
+        self.assertOptimizes(instructions, to=instructions)
+
+    def test_dump_unoptimized(self):
+        compiler = Compiler(peephole=True)
+        compiler.compile(
+            Parser().parse("int main(void) { int x = 1; return x; }"),
+        )
+        main = compiler.constants[compiler.functions["main"]]
+        self.assertEqual(
+            (
+                main.bytecode.dump(pretty=False),
+                main.bytecode.dump(pretty=False, optimized=False),
+            ),
+            (
+                "0 LOAD_CONST 1\n2 DUP\n4 STORE_VARIABLE 0\n6 RETURN 1",
+                "0 LOAD_CONST 1\n2 STORE_VARIABLE 0\n"
+                "4 LOAD_VARIABLE 0\n6 RETURN 1",
+            ),
+        )
@@ -4,15 +4,37 @@ from cycy.interpreter import CyCy
 from cycy.objects import W_Int32
 from cycy.parser.core import Parser
 from cycy.include import Included
-from cycy.parser.preprocessor import Preprocessor
+from cycy.parser.preprocessor import IncludeTooDeep, Preprocessor
 
 
 class FakeIncluder(object):
     def include(self, name, parser):
         return Included(
-            tokens=parser.lexer.lex("int foo(void) {\nreturn 12;\n}\n"),
+            tokens=parser.lexer.lex(
+                "int foo(void) {\nreturn 12;\n}\n",
+            ).compact(),
         )
 
+    def forget_missing(self):
+        pass
+
+
+class Headers(object):
+    def __init__(self, **headers):
+        self.headers = headers
+        self.included = []
+
+    def include(self, name, parser):
+        self.included.append(name)
+        return Included(
+            tokens=parser.lexer.lex(
+                self.headers[name.replace(".", "_")],
+            ).compact(),
+        )
+
+    def forget_missing(self):
+        pass
+
 
 class TestParser(TestCase):
     def setUp(self):
@@ -31,3 +53,102 @@ class TestParser(TestCase):
             ],
         )
         self.assertEqual(w_return, W_Int32(12))
+
+
+class TestOnce(TestCase):
+    def preprocessed(self, headers, source):
+        parser = Parser(preprocessor=Preprocessor(includers=[headers]))
+        return [
+            token.value for token in parser.preprocessor.preprocessed(
+                parser.lexer.lex(source).compact(), parser,
+            )
+        ]
+
+    def test_nested_includes(self):
+        headers = Headers(a_h='#include "b.h"\nint a;', b_h="int b;")
+        self.assertEqual(
+            self.preprocessed(headers, '#include "a.h"'),
+            ["int", "b", ";", "int", "a", ";"],
+        )
+
+    def test_pragma_once(self):
+        headers = Headers(
+            base_h="#pragma once\nint base;",
+            left_h='#include "base.h"\nint left;',
+            right_h='#include "base.h"\nint right;',
+        )
+        self.assertEqual(
+            self.preprocessed(
+                headers, '#include "left.h"\n#include "right.h"\n',
+            ),
+            ["int", "base", ";", "int", "left", ";", "int", "right", ";"],
+        )
+
+    def test_unguarded_headers_are_repeated(self):
+        headers = Headers(base_h="int base;")
+        self.assertEqual(
+            self.preprocessed(
+                headers, '#include "base.h"\n#include "base.h"\n',
+            ),
+            ["int", "base", ";", "int", "base", ";"],
+        )
+
+    def test_once_per_stream(self):
+        headers = Headers(base_h="#pragma once\nint base;")
+        source = '#include "base.h"\n#include "base.h"\n'
+        self.assertEqual(
+            (
+                self.preprocessed(headers, source),
+                self.preprocessed(headers, source),
+            ),
+            (["int", "base", ";"], ["int", "base", ";"]),
+        )
+
+    def test_pragma_once_in_the_main_source_does_nothing(self):
+        headers = Headers()
+        self.assertEqual(
+            self.preprocessed(headers, "#pragma once\nint x;"),
+            ["int", "x", ";"],
+        )
+
+    def test_pragma_once_with_extra_spaces(self):
+        headers = Headers(once_h="#pragma   once \nint once;")
+        self.assertEqual(
+            self.preprocessed(
+                headers, '#include "once.h"\n#include "once.h"\n',
+            ),
+            ["int", "once", ";"],
+        )
+
+    def test_unknown_pragmas_are_ignored(self):
+        headers = Headers(base_h="#pragma pack(1)\nint base;")
+        self.assertEqual(
+            self.preprocessed(
+                headers, '#include "base.h"\n#include "base.h"\n',
+            ),
+            ["int", "base", ";", "int", "base", ";"],
+        )
+
+    def test_recursive_include(self):
+        headers = Headers(loop_h='#include "loop.h"')
+        with self.assertRaises(IncludeTooDeep):
+            self.preprocessed(headers, '#include "loop.h"')
+
+    def test_recursive_include_with_pragma_once(self):
+        headers = Headers(loop_h='#pragma once\n#include "loop.h"\nint x;')
+        self.assertEqual(
+            self.preprocessed(headers, '#include "loop.h"'), ["int", "x", ";"],
+        )
+
+    def test_standard_headers_are_included_once(self):
+        w_return = CyCy().interpret(
+            [
+                """
+                #include "cycy/stdio.h"
+                #include "cycy/stdio.h"
+
+                int main(void) { return puts("hi"); }
+                """,
+            ],
+        )
+        self.assertEqual(w_return, W_Int32(3))
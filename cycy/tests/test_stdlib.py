@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from cycy.include import StandardLibraryIncluder
+from cycy.interpreter import CyCy
+from cycy.objects import W_Int32
+from cycy.parser.core import Parser
+from cycy.stdlib.headers import HEADERS
+from cycy.stdlib.library import LIBRARY
+from cycy.tests.util import Recorder
+
+
+class TestStandardLibrary(TestCase):
+    def test_headers_are_prelexed(self):
+        included = StandardLibraryIncluder(libraries=HEADERS).include(
+            name="cycy/stdio.h", parser=Parser(),
+        )
+        self.assertEqual(included.path, None)
+        self.assertEqual(
+            [token.value for token in included.tokens][:3],
+            ["#pragma once", "int", "puts"],
+        )
+
+    def test_library_is_precompiled(self):
+        self.assertEqual(
+            [unit.undefined() for unit in LIBRARY], [[]] * len(LIBRARY),
+        )
+
+    def test_hello_world(self):
+        recorder = Recorder()
+        cycy = CyCy(stdout=recorder)
+        w_exit_status = cycy.interpret(
+            [
+                """
+                #include "cycy/stdio.h"
+                int main(void) { puts("Hello, world!"); return 0; }
+                """,
+            ],
+        )
+        self.assertEqual(
+            (w_exit_status, "".join(recorder.writes)),
+            (W_Int32(0), "Hello, world!\n"),
+        )
+
+    def test_programs_can_define_library_functions(self):
+        w_exit_status = CyCy().interpret(
+            [
+                """
+                int puts(const char * string) { return 12; }
+                int main(void) { return puts("ignored"); }
+                """,
+            ],
+        )
+        self.assertEqual(w_exit_status, W_Int32(12))
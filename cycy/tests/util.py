@@ -0,0 +1,35 @@
+"""
+Streams for tests to stand in for stdin and stdout.
+
+"""
+
+from rpython.rlib import streamio
+
+
+class Recorder(streamio.Stream):
+    """
+    Records each write made to it.
+
+    """
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+class Input(streamio.Stream):
+    """
+    Reads from the given data, recording each read made from it.
+
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.reads = []
+
+    def read(self, n):
+        read, self.data = self.data[:n], self.data[n:]
+        self.reads.append(read)
+        return read
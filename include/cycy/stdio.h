@@ -1 +1,4 @@
+#pragma once
+
 int puts(const char * string);
+int getchar(void);
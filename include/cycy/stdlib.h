@@ -0,0 +1,3 @@
+#pragma once
+
+int abs(int value);
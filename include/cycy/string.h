@@ -0,0 +1,4 @@
+#pragma once
+
+int strlen(const char * string);
+int strcmp(const char * left, const char * right);